@@ -0,0 +1,801 @@
+# -*- coding: utf-8 -*-
+"""Excel翻译工具性能基准测试
+
+用法:
+    python benchmark.py clients [--calls 200] [--live]
+    python benchmark.py prescan [--sheets 5] [--rows 20000] [--cols 8]
+    python benchmark.py detect [--cells 100000]
+    python benchmark.py writers [--rows 100000] [--cols 8]
+    python benchmark.py assemble [--rows 20000] [--cols 200] [--categorical]
+    python benchmark.py glossary [--terms 100000] [--texts 50000]
+    python benchmark.py segment [--cells 2000] [--limit 200]
+    python benchmark.py startup [--repeat 3] [--import-budget 0.5] [--window-budget 2]
+    python benchmark.py pipeline [--sheets 3] [--rows 20000] [--cols 6] [--duplicate-ratio 0.5]
+                                 [--mix zh=0.6,en=0.3,num=0.1] [--latency 0.05] [--failure-rate 0.01]
+
+pipeline 生成合成工作簿，用本地模拟翻译客户端（可注入延迟和失败）运行完整流程，
+不访问网络，固定随机种子时结果可复现
+"""
+import argparse
+import collections
+import functools
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource  # 仅 Unix 可用，用于读取进程内存峰值
+except ImportError:
+    resource = None
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+from deep_translator import GoogleTranslator
+from deep_translator.exceptions import RequestError, TooManyRequests
+
+from langdetect import detect
+
+from excel_translator import (OUTPUT_ENGINES, ExcelTranslator, GlossaryBackend, RateLimiter, SidecarWriter,
+                               TranslatorClientPool, categorize_text_columns)
+
+# 生成测试数据用的中文词汇
+WORDS = ['苹果', '香蕉', '产品', '部门', '销售', '库存', '客户', '订单', '发货', '仓库',
+         '采购', '财务', '价格', '数量', '备注', '规格', '型号', '颜色', '尺寸', '供应商']
+EN_WORDS = ['apple', 'order', 'stock', 'customer', 'warehouse', 'shipping', 'price', 'quantity',
+            'remark', 'supplier', 'finance', 'model', 'color', 'size', 'product', 'department']
+
+
+class MockGoogleHandler(BaseHTTPRequestHandler):
+    """模拟 Google 翻译移动版页面的本地HTTP服务，支持 keep-alive"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # 头和正文分开写入，避免 Nagle 与延迟确认叠加的 40ms 延迟
+
+    def do_GET(self):
+        body = '<html><body><div class="result-container">translated</div></body></html>'.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_mock_server():
+    """启动本地模拟服务，返回 (服务器, 地址)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockGoogleHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/m"
+
+def measure(func, calls):
+    """调用 func 多次，返回每次耗时（毫秒）"""
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        func(f"测试文本 {i}")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def report(name, latencies):
+    """打印延迟统计"""
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{name:<28} 平均 {statistics.mean(ordered):8.2f}ms  "
+          f"中位数 {statistics.median(ordered):8.2f}ms  p95 {p95:8.2f}ms")
+
+PACK_MARKER_PREFIX = re.compile(r'^(?:__P\d+__ )?')  # 打包请求中行首的编号标记（可能没有）
+
+class MockClient:
+    """本地模拟翻译客户端，不访问网络，记录首次调用时间
+
+    latency / jitter 模拟每次请求的网络延迟（秒），failure_rate / throttle_rate
+    为请求失败（RequestError）和被限流（TooManyRequests）的概率；
+    server_rate 模拟服务端的速率上限（所有客户端合计每秒请求数），超出时返回限流；
+    通过 functools.partial 绑定参数后作为 TranslatorClientPool 的 client_class 使用
+    """
+    first_call = None
+    _rng = random.Random(0)
+    _rng_lock = threading.Lock()
+    _window = collections.deque()  # 最近一秒内的请求时间（模拟服务端限流）
+
+    def __init__(self, source='auto', target='en', session=None, latency=0.0, jitter=0.0,
+                 failure_rate=0.0, throttle_rate=0.0, server_rate=None, **kwargs):
+        self.target = target
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.throttle_rate = throttle_rate
+        self.server_rate = server_rate
+
+    @classmethod
+    def seed(cls, seed):
+        """重置失败注入和延迟抖动使用的随机数以及服务端限流窗口"""
+        cls._rng = random.Random(seed)
+        cls._window.clear()
+
+    def _over_server_rate(self):
+        """按最近一秒的请求数判断是否超过服务端速率上限"""
+        if not self.server_rate:
+            return False
+        with MockClient._rng_lock:
+            now = time.monotonic()
+            window = MockClient._window
+            while window and now - window[0] >= 1.0:
+                window.popleft()
+            if len(window) >= self.server_rate:
+                return True
+            window.append(now)
+            return False
+
+    def translate(self, text, **kwargs):
+        if MockClient.first_call is None:
+            MockClient.first_call = time.perf_counter()
+        with MockClient._rng_lock:
+            roll = MockClient._rng.random()
+            delay = self.latency + MockClient._rng.uniform(0, self.jitter)
+        throttled = self._over_server_rate()
+        if delay > 0:
+            time.sleep(delay)
+        if throttled or roll < self.throttle_rate:
+            raise TooManyRequests()
+        if roll < self.throttle_rate + self.failure_rate:
+            raise RequestError()
+        # 与真实服务一样保留打包请求中的编号标记，只翻译标记后面的文本
+        return '\n'.join(PACK_MARKER_PREFIX.sub(lambda match: f"{match.group(0)}[{self.target}]", line, count=1)
+                         for line in text.split('\n'))
+
+def make_workbook(path, sheets=5, rows=20000, cols=8, seed=0):
+    """生成多工作表的测试工作簿"""
+    rng = random.Random(seed)
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for sheet in range(sheets):
+            data = {f"列{col}": [f"{rng.choice(WORDS)}{rng.randint(0, rows // 10)}" for _ in range(rows)]
+                    for col in range(cols)}
+            pd.DataFrame(data).to_excel(writer, sheet_name=f"Sheet{sheet + 1}", index=False)
+
+def parse_mix(text):
+    """解析语言比例，如 zh=0.6,en=0.3,num=0.1，返回归一化后的 {类型: 比例}"""
+    mix = {}
+    for item in text.split(','):
+        kind, _, weight = item.partition('=')
+        if kind.strip() not in ('zh', 'en', 'num'):
+            raise argparse.ArgumentTypeError(f"未知的单元格类型: {kind}（可用 zh、en、num）")
+        mix[kind.strip()] = float(weight)
+    total = sum(mix.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError("语言比例之和必须大于 0")
+    return {kind: weight / total for kind, weight in mix.items()}
+
+def make_cell(rng, kind, min_length, max_length):
+    """生成一个指定类型的单元格：zh 中文文本、en 英文文本、num 数字或编号"""
+    if kind == 'num':
+        return rng.choice([rng.randint(0, 10 ** 6), round(rng.uniform(0, 10000), 2), f"SKU-{rng.randint(0, 10 ** 6)}"])
+    length = rng.randint(min_length, max_length)
+    words = WORDS if kind == 'zh' else EN_WORDS
+    separator = '' if kind == 'zh' else ' '
+    parts = []
+    size = 0
+    while size < length:
+        parts.append(rng.choice(words) if rng.random() < 0.8 else str(rng.randint(0, 9999)))
+        size += len(parts[-1]) + len(separator)
+    return separator.join(parts)[:max(length, 1)]
+
+def make_synthetic_workbook(path, sheets=3, rows=20000, cols=6, duplicate_ratio=0.5,
+                            mix=None, min_length=4, max_length=30, seed=0, typed_cols=0):
+    """生成合成工作簿，返回单元格总数
+
+    duplicate_ratio 为单元格重复已出现过的值（跨列、跨工作表）的概率，
+    mix 为各类型单元格的比例（见 parse_mix），文本长度在 [min_length, max_length] 之间；
+    typed_cols 为每个工作表额外追加的无需翻译的列数（依次为数字编号、日期、SKU 编码）
+    """
+    rng = random.Random(seed)
+    mix = mix or {'zh': 0.6, 'en': 0.3, 'num': 0.1}
+    kinds, weights = zip(*mix.items())
+    pool = []
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for sheet in range(sheets):
+            data = {}
+            for col in range(cols):
+                column = []
+                for _ in range(rows):
+                    if pool and rng.random() < duplicate_ratio:
+                        column.append(rng.choice(pool))
+                    else:
+                        value = make_cell(rng, rng.choices(kinds, weights)[0], min_length, max_length)
+                        pool.append(value)
+                        column.append(value)
+                data[f"列{col}"] = column
+            for col in range(typed_cols):
+                kind = col % 3
+                if kind == 0:
+                    column = [rng.randint(0, 10 ** 6) for _ in range(rows)]
+                elif kind == 1:
+                    column = [f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}" for _ in range(rows)]
+                else:
+                    column = [f"SKU-{rng.randint(0, 10 ** 6)}" for _ in range(rows)]
+                data[f"字段{col}"] = column
+            pd.DataFrame(data).to_excel(writer, sheet_name=f"Sheet{sheet + 1}", index=False)
+    return sheets * rows * (cols + typed_cols)
+
+def peak_rss_mb():
+    """进程常驻内存峰值（MB），不支持的平台返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+def run_pipeline(input_file, output_file, args):
+    """用模拟客户端运行一次完整流程，返回结果字典"""
+    MockClient.seed(args.seed)
+    translator = ExcelTranslator()
+    translator.clients.client_class = functools.partial(
+        MockClient, latency=args.latency, jitter=args.jitter,
+        failure_rate=args.failure_rate, throttle_rate=args.throttle_rate, server_rate=args.server_rate)
+    translator.set_concurrency(args.workers)
+    translator.rate_limiter = RateLimiter(args.rate, adaptive=not args.fixed_rate, cooldown=args.cooldown)
+    translator.resume = False
+    translator.streaming = args.streaming
+    translator.categorical = args.categorical
+    translator.profiler.enabled = not args.no_profile
+    translator.set_output(args.output_engine, args.sidecar)
+    translator.process_workers = args.processes
+
+    # tracemalloc 统计精确但会明显拖慢解析和写出，默认只读取进程的常驻内存峰值
+    if args.tracemalloc:
+        tracemalloc.start()
+    start = time.perf_counter()
+    success = translator.process_excel(input_file, output_file)
+    seconds = time.perf_counter() - start
+    if args.tracemalloc:
+        peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+    else:
+        peak = peak_rss_mb()
+    return {
+        'success': success,
+        'seconds': round(seconds, 3),
+        'peak_memory_mb': round(peak, 1) if peak is not None else None,
+        'unique_values': translator.dedup_report['unique_values'] if translator.dedup_report else None,
+        'failed_values': translator.failed_count,
+        'metrics': translator.metrics.snapshot()
+    }
+
+def bench_pipeline(args):
+    """离线运行完整流程：解析、去重、并发翻译（模拟客户端）、写出，报告吞吐量、内存峰值和请求数"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_file = os.path.join(tmp_dir, 'input.xlsx')
+        output_file = os.path.join(tmp_dir, 'output.xlsx')
+        start = time.perf_counter()
+        cells = make_synthetic_workbook(input_file, args.sheets, args.rows, args.cols, args.duplicate_ratio,
+                                        args.mix, args.min_length, args.max_length, args.seed, args.typed_columns)
+        generate = time.perf_counter() - start
+        runs = [run_pipeline(input_file, output_file, args) for _ in range(args.repeat)]
+
+    best = min(runs, key=lambda run: run['seconds'])
+    report = {
+        'cells': cells,
+        'generate_seconds': round(generate, 3),
+        'runs': runs,
+        'best_seconds': best['seconds'],
+        'cells_per_second': round(cells / best['seconds'], 1) if best['seconds'] else None
+    }
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"合成工作簿: {args.sheets} 个工作表 x {args.rows} 行 x {args.cols} 列 = {cells} 个单元格 "
+          f"(重复率 {args.duplicate_ratio}, 生成耗时 {generate:.2f}s)")
+    for i, run in enumerate(runs, 1):
+        counters = run['metrics']['counters']
+        latency = run['metrics']['latency']
+        print(f"第 {i} 次: {'成功' if run['success'] else '失败'} {run['seconds']:.2f}s "
+              f"({cells / run['seconds']:.0f} 单元格/秒), 唯一值 {run['unique_values']}, "
+              f"内存峰值 {run['peak_memory_mb']}MB")
+        print(f"    请求 {counters['requests']} 次, 重试 {counters['retries']} 次, 限流 {counters['throttled']} 次, "
+              f"熔断 {counters.get('circuit_opened', 0)} 次, "
+              f"失败值 {run['failed_values']}, 发送 {counters['bytes_sent']} 字节, "
+              f"延迟 p50 {latency['p50']}s p95 {latency['p95']}s p99 {latency['p99']}s")
+        print("    阶段耗时: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in run['metrics']['stages'].items()))
+    print(f"最佳: {best['seconds']:.2f}s, {report['cells_per_second']} 单元格/秒")
+
+def bench_writers(args):
+    """对比各 Excel 输出引擎和旁路格式写出同一个翻译结果表的耗时和文件大小"""
+    rng = random.Random(args.seed)
+    data = {}
+    for col in range(args.cols):
+        values = [make_cell(rng, 'zh', 4, 20) for _ in range(args.rows)]
+        data[f"列{col}"] = values
+        data[f"列{col}_EN"] = [f"[en]{value}" for value in values]
+    df = pd.DataFrame(data)
+    print(f"写出 {args.rows} 行 x {len(df.columns)} 列")
+
+    translator = ExcelTranslator()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for engine in OUTPUT_ENGINES:
+            try:
+                translator.set_output(engine)
+            except ImportError as e:
+                print(f"{engine:<12} 跳过: {e}")
+                continue
+            path = os.path.join(tmp_dir, f"{engine}.xlsx")
+            start = time.perf_counter()
+            with translator.open_output(path) as writer:
+                translator.write_sheet(writer, df, 'Sheet1')
+            seconds = time.perf_counter() - start
+            print(f"{engine:<12} {seconds:8.2f}s  {os.path.getsize(path) / 1024 / 1024:6.1f}MB")
+
+        for fmt in SidecarWriter.FORMATS:
+            try:
+                translator.set_output(sidecars=[fmt])
+            except ImportError as e:
+                print(f"{fmt:<12} 跳过: {e}")
+                continue
+            sidecars = SidecarWriter(os.path.join(tmp_dir, 'output.xlsx'), [fmt])
+            start = time.perf_counter()
+            if fmt == 'jsonl':
+                sidecars.write_pairs(zip(df['列0'], df['列0_EN']))
+            else:
+                sidecars.write_frame(df, 'Sheet1')
+            sidecars.close()
+            seconds = time.perf_counter() - start
+            size = sum(os.path.getsize(path) for path in sidecars.paths)
+            print(f"{fmt:<12} {seconds:8.2f}s  {size / 1024 / 1024:6.1f}MB")
+
+def legacy_assemble(df, translations):
+    """旧实现：逐列 map 后用列表重排整个表"""
+    df = df.copy()
+    for column in list(df.columns):
+        en_column = f"{column}_EN"
+        df[en_column] = df[column].map(lambda x: translations.get(x, x))
+        cols = list(df.columns)
+        cols.remove(en_column)
+        cols.insert(cols.index(column) + 1, en_column)
+        df = df[cols]
+    return df
+
+def bench_assemble(args):
+    """对比逐列重排和一次性构建输出表的耗时，宽表上差距最明显"""
+    rng = random.Random(args.seed)
+    pool = [make_cell(rng, 'zh', 4, 20) for _ in range(args.unique)]
+    data = {}
+    for col in range(args.cols):
+        if col % 4 == 3:
+            data[f"列{col}"] = [rng.randint(0, 10 ** 6) for _ in range(args.rows)]
+        else:
+            data[f"列{col}"] = [rng.choice(pool) for _ in range(args.rows)]
+    df = pd.DataFrame(data)
+    translations = {value: f"[en]{value}" for value in pool}
+    print(f"组装 {args.rows} 行 x {args.cols} 列（{len(translations)} 条译文）")
+
+    start = time.perf_counter()
+    legacy = legacy_assemble(df, translations)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lookup = pd.Series(translations, dtype=object)
+    current = ExcelTranslator.build_output_frame(df, lookup)
+    current_seconds = time.perf_counter() - start
+
+    print(f"逐列重排   {legacy_seconds:8.3f}s")
+    print(f"一次性构建 {current_seconds:8.3f}s  加速 {legacy_seconds / max(current_seconds, 1e-9):.1f}x")
+    print(f"结果一致: {legacy.astype(object).equals(current.astype(object))}")
+
+    if args.categorical:
+        start = time.perf_counter()
+        categorized = categorize_text_columns(df.copy())
+        convert_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        categorical = ExcelTranslator.build_output_frame(categorized, lookup)
+        categorical_seconds = time.perf_counter() - start
+        memory = df.memory_usage(deep=True).sum() / 1024 / 1024
+        categorical_memory = categorized.memory_usage(deep=True).sum() / 1024 / 1024
+        print(f"分类类型   {categorical_seconds:8.3f}s  加速 {current_seconds / max(categorical_seconds, 1e-9):.1f}x"
+              f"（转换 {convert_seconds:.3f}s）")
+        print(f"输入表内存 {memory:8.1f}MB -> {categorical_memory:.1f}MB")
+        print(f"结果一致: {current.astype(object).equals(categorical.astype(object))}")
+
+def bench_prescan(args):
+    """对比优化前（预扫描与处理各解析一次）与优化后（只解析一次）的首次翻译耗时"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_file = os.path.join(tmp_dir, 'input.xlsx')
+        output_file = os.path.join(tmp_dir, 'output.xlsx')
+        print(f"生成测试文件: {args.sheets} 个工作表 x {args.rows} 行 x {args.cols} 列")
+        make_workbook(input_file, args.sheets, args.rows, args.cols)
+
+        # 优化前：预扫描时逐个 pd.read_excel 所有工作表，处理第一个工作表前再解析一次
+        start = time.perf_counter()
+        sheet_names = pd.ExcelFile(input_file).sheet_names
+        for sheet_name in sheet_names:
+            pd.read_excel(input_file, sheet_name=sheet_name)
+        pd.read_excel(input_file, sheet_name=sheet_names[0])
+        legacy_first = time.perf_counter() - start
+        for sheet_name in sheet_names[1:]:
+            pd.read_excel(input_file, sheet_name=sheet_name)
+        legacy_parse = time.perf_counter() - start
+
+        # 优化后：完整运行 process_excel，记录第一次翻译请求的时间
+        translator = ExcelTranslator()
+        translator.clients.client_class = MockClient
+        translator.set_concurrency(requests_per_second=1000000)
+        MockClient.first_call = None
+        start = time.perf_counter()
+        translator.process_excel(input_file, output_file)
+        total = time.perf_counter() - start
+        first = MockClient.first_call - start if MockClient.first_call else float('nan')
+
+    print(f"优化前: 首次翻译前解析耗时 {legacy_first:.2f}s, 全部解析耗时 {legacy_parse:.2f}s "
+          f"({len(sheet_names) * 2} 次解析)")
+    print(f"优化后: 首次翻译耗时 {first:.2f}s ({len(sheet_names)} 次解析), 完整运行 {total:.2f}s")
+
+def bench_detect(args):
+    """对比逐个单元格 langdetect 与向量化语言分类的耗时"""
+    rng = random.Random(0)
+    templates = ['{word}{n}', 'Item {n}', 'Order shipped to warehouse {n}', '{n}', 'SKU-{n}', '{word} Model {n}']
+    cells = [rng.choice(templates).format(word=rng.choice(WORDS), n=rng.randint(0, 99999))
+             for _ in range(args.cells)]
+
+    # 优化前：逐个单元格扫描中文字符，非中文调用 langdetect（只测样本后按比例估算）
+    sample = cells[:args.legacy_sample]
+    start = time.perf_counter()
+    for text in sample:
+        if not any('\u4e00' <= char <= '\u9fff' for char in text):
+            try:
+                detect(text)
+            except Exception:
+                pass
+    legacy = (time.perf_counter() - start) * len(cells) / len(sample)
+
+    # 优化后：整列向量化分类
+    translator = ExcelTranslator()
+    start = time.perf_counter()
+    translator.classify_languages(cells)
+    vectorized = time.perf_counter() - start
+
+    print(f"{len(cells)} 个单元格")
+    print(f"逐个 langdetect（按 {len(sample)} 个样本估算）: {legacy:.2f}s")
+    print(f"向量化分类: {vectorized * 1000:.1f}ms")
+
+def make_long_cell(rng, lines):
+    """生成一个多行长文本单元格：段落、带缩进的要点、CRLF 换行、空行和没有空白的长串"""
+    newline = rng.choice(['\n', '\r\n'])
+    parts = []
+    for _ in range(lines):
+        kind = rng.random()
+        if kind < 0.4:
+            line = ''.join(make_cell(rng, 'zh', 20, 60) + '。' for _ in range(rng.randint(2, 6)))
+        elif kind < 0.7:
+            line = rng.choice(['  - ', '    ', '\t', '  1. ']) + make_cell(rng, 'zh', 10, 40) + '。'
+        elif kind < 0.85:
+            line = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 80))) + '.'
+        elif kind < 0.95:
+            line = ''
+        else:
+            line = 'ID' + ''.join(rng.choice('0123456789ABCDEF') for _ in range(rng.randint(100, 400)))
+        parts.append(line)
+    return newline.join(parts)
+
+def line_layout(text):
+    """每一行的缩进和换行符，用于检查分段翻译后格式是否保留"""
+    return [(line[:len(line) - len(line.lstrip())], line.endswith('\r')) for line in text.split('\n')]
+
+def bench_segment(args):
+    """超长文本分段和拼接的耗时，并检查往返一致：分段拼回等于原文，拼接译文保留每行缩进和 CRLF"""
+    rng = random.Random(args.seed)
+    cells = [make_long_cell(rng, rng.randint(2, 12)) for _ in range(args.cells)]
+    translator = ExcelTranslator()
+    print(f"分段 {len(cells)} 个长文本单元格（每段不超过 {args.limit} 个字符）")
+
+    start = time.perf_counter()
+    plans = [translator.segment_text(text, args.limit) for text in cells]
+    segment_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    joined = [ExcelTranslator.join_segments(segments, [segment for segment, _ in segments], 'zh-CN')
+              for segments in plans]
+    join_seconds = time.perf_counter() - start
+
+    mismatched = [idx for idx, (text, segments, result) in enumerate(zip(cells, plans, joined))
+                  if ''.join(segment + separator for segment, separator in segments) != text.strip()
+                  or any(len(segment) > args.limit or segment != segment.strip() for segment, _ in segments)
+                  or line_layout(result) != line_layout(text.strip())]
+    print(f"分段 {segment_seconds:8.3f}s  共 {sum(len(segments) for segments in plans)} 段")
+    print(f"拼接 {join_seconds:8.3f}s")
+    print(f"往返一致: {not mismatched}")
+    if mismatched:
+        print(f"不一致的单元格: {mismatched[:10]}")
+        sys.exit(1)
+
+def bench_glossary(args):
+    """术语表规模对索引构建、整格匹配和嵌入术语查找耗时的影响"""
+    rng = random.Random(args.seed)
+    chars = [chr(code) for code in range(0x4e00, 0x4e00 + 3000)]
+    terms = {}
+    while len(terms) < args.terms:
+        terms[''.join(rng.choice(chars) for _ in range(rng.randint(2, 8)))] = f"Term {len(terms)}"
+    term_list = list(terms)
+    texts = []
+    for _ in range(args.texts):
+        roll = rng.random()
+        if roll < args.exact_ratio:
+            texts.append(rng.choice(term_list))
+        elif roll < args.exact_ratio + args.embedded_ratio:
+            texts.append(make_cell(rng, 'zh', 4, 20) + rng.choice(term_list) + make_cell(rng, 'zh', 2, 10))
+        else:
+            texts.append(make_cell(rng, 'zh', 4, 30))
+
+    glossary = GlossaryBackend({('zh-CN', 'en'): terms})
+    start = time.perf_counter()
+    glossary.index('zh-CN', 'en')
+    index_seconds = time.perf_counter() - start
+    # tracemalloc 会拖慢构建，内存单独再构建一次测量
+    glossary.add('zh-CN', 'en', {})
+    tracemalloc.start()
+    glossary.index('zh-CN', 'en')
+    index_memory = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    exact = glossary.lookup_many(texts, 'zh-CN', 'en')
+    exact_seconds = time.perf_counter() - start
+    rest = [text for text in texts if text not in exact]
+    start = time.perf_counter()
+    for text in rest:
+        glossary.prepare(text, 'zh-CN', 'en')
+    prepare_seconds = time.perf_counter() - start
+    stats = glossary.stats()
+
+    print(f"{len(terms)} 条术语, {len(texts)} 条文本")
+    print(f"构建字典树: {index_seconds:.2f}s, {index_memory:.0f}MB")
+    print(f"整格匹配: {exact_seconds * 1000:.0f}ms, 命中 {stats['exact_hits']}")
+    print(f"嵌入术语: {prepare_seconds * 1000:.0f}ms ({prepare_seconds / max(len(rest), 1) * 1e6:.1f}us/条), "
+          f"含术语的文本 {stats['embedded_texts']}, 术语命中 {stats['term_hits']}")
+
+# 子进程中执行：分别计时导入本模块和后台预热（预热中各依赖的耗时由 warm_up 返回），
+# stderr 中用标记分隔 -X importtime 输出，只统计导入本模块阶段
+STARTUP_IMPORT_SCRIPT = """
+import json, sys, time
+sys.stderr.write('--import--\\n'); sys.stderr.flush()
+start = time.perf_counter()
+import excel_translator
+imported = time.perf_counter() - start
+sys.stderr.write('--warm-up--\\n'); sys.stderr.flush()
+start = time.perf_counter()
+steps = excel_translator.warm_up(excel_translator.ExcelTranslator())
+print(json.dumps({'import': imported, 'warm_up': time.perf_counter() - start, 'steps': steps}))
+"""
+
+# 子进程中执行：创建主窗口并完成第一次绘制后输出耗时
+STARTUP_WINDOW_SCRIPT = """
+import time
+start = time.perf_counter()
+import excel_translator
+app = excel_translator.TranslatorGUI()
+app.window.update()
+print(time.perf_counter() - start, flush=True)
+app.window.destroy()
+"""
+
+def parse_importtime(stderr):
+    """解析 -X importtime 的输出，按阶段标记分组，返回 {阶段: [(模块名, 累计耗时秒, 层级), ...]}"""
+    phases = {}
+    entries = phases.setdefault('startup', [])
+    for line in stderr.splitlines():
+        if line.startswith('--') and line.endswith('--'):
+            entries = phases.setdefault(line.strip('-'), [])
+            continue
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(cumulative) / 1e6, depth))
+    return phases
+
+def measure_window():
+    """启动子进程创建主窗口，返回 (进程启动到窗口显示的耗时, 子进程内部耗时)；无法创建窗口时抛出 RuntimeError"""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', STARTUP_WINDOW_SCRIPT], cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    wall = time.perf_counter() - start
+    _, stderr = process.communicate()
+    if process.returncode != 0 or not line.strip():
+        lines = stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"退出码 {process.returncode}")
+    return wall, float(line)
+
+def bench_startup(args):
+    """冷启动耗时：导入模块（各依赖的导入耗时）、后台预热、进程启动到主窗口显示"""
+    imports = []
+    for _ in range(args.repeat):
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_IMPORT_SCRIPT],
+                                 cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+        if process.returncode != 0:
+            print(process.stderr.strip().splitlines()[-1], file=sys.stderr)
+            sys.exit(2)
+        imports.append((json.loads(process.stdout), parse_importtime(process.stderr)))
+    result, phases = min(imports, key=lambda item: item[0]['import'])
+
+    windows = []
+    window_error = None
+    for _ in range(args.repeat):
+        try:
+            windows.append(measure_window())
+        except RuntimeError as e:
+            window_error = str(e)
+            break
+    window = min(windows) if windows else None
+
+    report = {
+        'import_seconds': round(result['import'], 4),
+        'import_modules': {name: round(seconds, 4) for name, seconds, depth in phases.get('import', []) if depth == 1},
+        'warm_up_seconds': round(result['warm_up'], 4),
+        'warm_up_steps': {name: round(seconds, 4) for name, seconds in result['steps'].items()},
+        'window_seconds': round(window[0], 4) if window else None,
+        'window_error': window_error
+    }
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        print(f"导入 excel_translator: {report['import_seconds'] * 1000:.0f}ms（{args.repeat} 次取最快）")
+        for name, seconds in sorted(report['import_modules'].items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {name:<32} {seconds * 1000:8.1f}ms")
+        print(f"后台预热（首次处理前）: {report['warm_up_seconds'] * 1000:.0f}ms")
+        for name, seconds in report['warm_up_steps'].items():
+            print(f"    {name:<32} {seconds * 1000:8.1f}ms")
+        if window:
+            print(f"进程启动到主窗口显示: {window[0] * 1000:.0f}ms（其中导入和创建窗口 {window[1] * 1000:.0f}ms）")
+        else:
+            print(f"进程启动到主窗口显示: 无法测量（{window_error}）")
+
+    # 超出预算时以非零退出码结束，便于在持续集成中发现启动变慢
+    over = []
+    if args.import_budget is not None and result['import'] > args.import_budget:
+        over.append(f"导入耗时 {result['import']:.3f}s 超出预算 {args.import_budget}s")
+    if args.window_budget is not None and window and window[0] > args.window_budget:
+        over.append(f"窗口显示耗时 {window[0]:.3f}s 超出预算 {args.window_budget}s")
+    for message in over:
+        print(message, file=sys.stderr)
+    if over:
+        sys.exit(1)
+
+def bench_clients(args):
+    """对比每次新建 GoogleTranslator 与复用客户端池的单次调用延迟"""
+    server = None
+    base_url = None
+    if not args.live:
+        server, base_url = start_mock_server()
+        print(f"使用本地模拟服务: {base_url}")
+    else:
+        print("使用真实 Google 翻译服务")
+
+    def per_call(text):
+        # 优化前：每次请求都新建客户端，requests.get 每次重新建立连接
+        translator = GoogleTranslator(source='zh-CN', target='en')
+        if base_url:
+            translator._base_url = base_url
+        return translator.translate(text=text)
+
+    pool = TranslatorClientPool()
+
+    def pooled(text):
+        # 优化后：复用当前线程的客户端和 HTTP 长连接
+        translator = pool.get('zh-CN', 'en')
+        if base_url:
+            translator._base_url = base_url
+        return translator.translate(text=text)
+
+    # 预热，排除首次导入和DNS解析的影响
+    per_call("预热")
+    pooled("预热")
+
+    report("每次新建 GoogleTranslator", measure(per_call, args.calls))
+    report("复用客户端池", measure(pooled, args.calls))
+
+    if server:
+        server.shutdown()
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Excel翻译工具性能基准测试")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    clients_parser = subparsers.add_parser('clients', help="翻译客户端单次调用延迟")
+    clients_parser.add_argument('--calls', type=int, default=200, help="调用次数")
+    clients_parser.add_argument('--live', action='store_true', help="使用真实 Google 服务（需要联网）")
+    clients_parser.set_defaults(func=bench_clients)
+
+    prescan_parser = subparsers.add_parser('prescan', help="预扫描解析到首次翻译的耗时")
+    prescan_parser.add_argument('--sheets', type=int, default=5, help="工作表数量")
+    prescan_parser.add_argument('--rows', type=int, default=20000, help="每个工作表的行数")
+    prescan_parser.add_argument('--cols', type=int, default=8, help="每个工作表的列数")
+    prescan_parser.set_defaults(func=bench_prescan)
+
+    detect_parser = subparsers.add_parser('detect', help="语言分类耗时")
+    detect_parser.add_argument('--cells', type=int, default=100000, help="单元格数量")
+    detect_parser.add_argument('--legacy-sample', type=int, default=2000, help="逐个检测时实际测量的样本数")
+    detect_parser.set_defaults(func=bench_detect)
+
+    startup_parser = subparsers.add_parser('startup', help="冷启动耗时：模块导入、后台预热、主窗口显示")
+    startup_parser.add_argument('--repeat', type=int, default=3, help="重复次数，取最快的一次")
+    startup_parser.add_argument('--top', type=int, default=10, help="列出导入最慢的前几个模块")
+    startup_parser.add_argument('--import-budget', type=float, help="导入耗时上限（秒），超出时退出码为 1")
+    startup_parser.add_argument('--window-budget', type=float, help="进程启动到窗口显示的耗时上限（秒），超出时退出码为 1")
+    startup_parser.add_argument('--json', action='store_true', help="输出 JSON")
+    startup_parser.set_defaults(func=bench_startup)
+
+    glossary_parser = subparsers.add_parser('glossary', help="术语表索引构建和查找耗时")
+    glossary_parser.add_argument('--terms', type=int, default=100000, help="术语数量")
+    glossary_parser.add_argument('--texts', type=int, default=50000, help="待查找的文本数量")
+    glossary_parser.add_argument('--exact-ratio', type=float, default=0.2, help="与术语完全一致的文本比例")
+    glossary_parser.add_argument('--embedded-ratio', type=float, default=0.4, help="嵌入术语的文本比例")
+    glossary_parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    glossary_parser.set_defaults(func=bench_glossary)
+
+    segment_parser = subparsers.add_parser('segment', help="超长文本分段和拼接耗时，检查格式往返一致")
+    segment_parser.add_argument('--cells', type=int, default=2000, help="长文本单元格数量")
+    segment_parser.add_argument('--limit', type=int, default=200, help="每段的最大字符数")
+    segment_parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    segment_parser.set_defaults(func=bench_segment)
+
+    writers_parser = subparsers.add_parser('writers', help="各输出引擎和旁路格式的写出耗时")
+    writers_parser.add_argument('--rows', type=int, default=100000, help="行数")
+    writers_parser.add_argument('--cols', type=int, default=4, help="原始列数（每列另有一个 _EN 列）")
+    writers_parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    writers_parser.set_defaults(func=bench_writers)
+
+    assemble_parser = subparsers.add_parser('assemble', help="输出表组装（原文列 + _EN 列）耗时")
+    assemble_parser.add_argument('--rows', type=int, default=20000, help="行数")
+    assemble_parser.add_argument('--cols', type=int, default=200, help="原始列数")
+    assemble_parser.add_argument('--unique', type=int, default=5000, help="不同文本值数量")
+    assemble_parser.add_argument('--categorical', action='store_true', help="同时测量分类类型列的组装耗时和内存")
+    assemble_parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    assemble_parser.set_defaults(func=bench_assemble)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help="离线运行完整流程（合成工作簿 + 模拟翻译客户端）")
+    pipeline_parser.add_argument('--sheets', type=int, default=3, help="工作表数量")
+    pipeline_parser.add_argument('--rows', type=int, default=20000, help="每个工作表的行数")
+    pipeline_parser.add_argument('--cols', type=int, default=6, help="每个工作表的列数")
+    pipeline_parser.add_argument('--typed-columns', type=int, default=0,
+                                 help="每个工作表额外追加的无需翻译的列数（数字编号、日期、SKU 编码轮换）")
+    pipeline_parser.add_argument('--duplicate-ratio', type=float, default=0.5, help="单元格重复已有值的概率")
+    pipeline_parser.add_argument('--mix', type=parse_mix, default='zh=0.6,en=0.3,num=0.1',
+                                 help="单元格类型比例（zh 中文、en 英文、num 数字/编号）")
+    pipeline_parser.add_argument('--min-length', type=int, default=4, help="文本单元格最小长度")
+    pipeline_parser.add_argument('--max-length', type=int, default=30, help="文本单元格最大长度")
+    pipeline_parser.add_argument('--latency', type=float, default=0.05, help="模拟每次请求的延迟（秒）")
+    pipeline_parser.add_argument('--jitter', type=float, default=0.0, help="延迟的随机抖动上限（秒）")
+    pipeline_parser.add_argument('--failure-rate', type=float, default=0.0, help="请求失败的概率")
+    pipeline_parser.add_argument('--throttle-rate', type=float, default=0.0, help="请求被限流（429）的概率")
+    pipeline_parser.add_argument('--server-rate', type=float, help="模拟服务端每秒请求数上限，超出时返回限流")
+    pipeline_parser.add_argument('--cooldown', type=float, default=0.5, help="熔断后的初始暂停时间（秒）")
+    pipeline_parser.add_argument('--fixed-rate', action='store_true', help="固定速率，不根据限流信号调整")
+    pipeline_parser.add_argument('--workers', type=int, default=4, help="并发翻译线程数")
+    pipeline_parser.add_argument('--rate', type=float, default=1000.0, help="每秒请求数上限")
+    pipeline_parser.add_argument('--processes', type=int, default=1, help="并行解析工作表的进程数")
+    pipeline_parser.add_argument('--streaming', action='store_true', help="使用流式读写模式")
+    pipeline_parser.add_argument('--categorical', action='store_true', help="文本列以分类类型加载")
+    pipeline_parser.add_argument('--no-profile', action='store_true', help="关闭列画像（对比整列跳过的效果）")
+    pipeline_parser.add_argument('--output-engine', choices=OUTPUT_ENGINES, default='openpyxl', help="Excel 输出引擎")
+    pipeline_parser.add_argument('--sidecar', action='append', default=[], choices=SidecarWriter.FORMATS,
+                                 help="同时输出的旁路格式（可多次指定）")
+    pipeline_parser.add_argument('--repeat', type=int, default=1, help="重复运行次数")
+    pipeline_parser.add_argument('--tracemalloc', action='store_true',
+                                 help="用 tracemalloc 统计每次运行的 Python 内存峰值（较慢，默认报告进程内存峰值）")
+    pipeline_parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    pipeline_parser.add_argument('--json', action='store_true', help="以 JSON 输出结果")
+    pipeline_parser.set_defaults(func=bench_pipeline)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
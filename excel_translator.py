@@ -1,56 +1,1919 @@
 # -*- coding: utf-8 -*-
-from deep_translator import GoogleTranslator
-import pandas as pd
 import time
 import os
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
-from tkinter.font import Font
+import sys
+import argparse
+import importlib
+import importlib.util
 import threading
-from queue import Queue
-from langdetect import detect  # 添加语言检测库
+import logging
+import sqlite3
+import unicodedata
+import json
+import csv
+import itertools
+import fnmatch
+import datetime
+import functools
+import math
+import contextlib
+import hashlib
+import random
+import re
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+from multiprocessing.managers import BaseManager
+
+class _LazyModule:
+    """延迟导入的模块：第一次访问属性时才真正导入
+
+    pandas、openpyxl、deep_translator、langdetect 等较重的依赖在开始处理文件时才导入，
+    图形界面可以先显示出来（GUI 显示后在后台预热，见 warm_up）；命令行模式不会导入 tkinter
+    """
+
+    _lock = threading.RLock()
+
+    def __init__(self, name, on_load=None):
+        """on_load 在模块导入后调用一次（用于设置模块级参数）"""
+        self._name = name
+        self._on_load = on_load
+        self._module = None
+
+    def load(self):
+        """导入并返回模块"""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    module = importlib.import_module(self._name)
+                    if self._on_load is not None:
+                        self._on_load(module)
+                    self._module = module
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+def _seed_langdetect(module):
+    # langdetect 默认带随机性，固定种子保证同一文本每次结果相同
+    module.DetectorFactory.seed = 0
+
+pd = _LazyModule('pandas')
+np = _LazyModule('numpy')
+openpyxl = _LazyModule('openpyxl')
+requests = _LazyModule('requests')
+bs4 = _LazyModule('bs4')
+deep_translator = _LazyModule('deep_translator')
+translator_errors = _LazyModule('deep_translator.exceptions')
+translator_validate = _LazyModule('deep_translator.validate')
+langdetect = _LazyModule('langdetect', _seed_langdetect)
+
+# 启动后台预热时导入的模块（按耗时从大到小）
+HEAVY_MODULES = (pd, openpyxl, deep_translator, translator_errors, translator_validate, requests, bs4, langdetect)
+
+tk = _LazyModule('tkinter')
+ttk = _LazyModule('tkinter.ttk')
+filedialog = _LazyModule('tkinter.filedialog')
+messagebox = _LazyModule('tkinter.messagebox')
+tkfont = _LazyModule('tkinter.font')
+
+# 日志默认关闭（NullHandler），命令行通过 -v 开启
+logger = logging.getLogger('excel_translator')
+logger.addHandler(logging.NullHandler())
+
+# 语言分类使用的正则
+CJK_PATTERN = r'[\u4e00-\u9fff]'
+NON_ASCII_PATTERN = r'[^\x00-\x7f]'
+ASCII_LETTER_PATTERN = r'[A-Za-z]'
+
+@functools.lru_cache(maxsize=100000)
+def detect_language_cached(text):
+    """调用 langdetect 检测语言并标准化语言代码，结果按文本缓存"""
+    try:
+        lang = langdetect.detect(text)
+    except Exception:
+        return None
+    # 标准化语言代码
+    lang_map = {
+        'zh-cn': 'zh-CN',
+        'zh-tw': 'zh-CN',
+        'zh': 'zh-CN',
+        'en': 'en'
+    }
+    return lang_map.get(lang.lower(), lang)
+
+# 默认翻译记忆库位置（跨运行、跨工作簿共享）
+DEFAULT_MEMORY_PATH = os.path.join(os.path.expanduser("~"), ".excel_translator", "translation_memory.db")
+
+class TranslationMemory:
+    """持久化翻译记忆库（SQLite），按 (源语言, 目标语言, 规范化文本) 缓存译文"""
+
+    def __init__(self, path=DEFAULT_MEMORY_PATH, max_entries=500000):
+        """打开（或创建）记忆库，max_entries 为最大条目数，超出时按最近最少使用淘汰"""
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0    # 命中次数
+        self.misses = 0  # 未命中次数
+        self._lock = threading.Lock()  # sqlite 连接在多线程间共享，需要加锁
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS memory ("
+            " source TEXT NOT NULL,"
+            " target TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " translation TEXT NOT NULL,"
+            " last_used INTEGER NOT NULL,"
+            " PRIMARY KEY (source, target, text))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_memory_last_used ON memory (last_used)")
+        self._conn.commit()
+
+        # last_used 使用单调递增的计数器，而不是时间戳，保证LRU顺序稳定
+        row = self._conn.execute("SELECT COUNT(*), COALESCE(MAX(last_used), 0) FROM memory").fetchone()
+        self._count, self._clock = row
+
+    @staticmethod
+    def normalize(text):
+        """规范化文本作为缓存键：统一全角/半角、去除首尾空白、合并行内连续空白"""
+        text = unicodedata.normalize('NFKC', text)
+        lines = [' '.join(line.split()) for line in text.strip().splitlines()]
+        return '\n'.join(lines)
+
+    def _tick(self):
+        """获取下一个LRU时钟值（调用方需持有锁）"""
+        self._clock += 1
+        return self._clock
+
+    def get(self, source, target, text):
+        """查询单条译文，未命中返回 None"""
+        return self.get_many(source, target, [text]).get(text)
+
+    def get_many(self, source, target, texts):
+        """批量查询译文，返回 {原文: 译文}，只包含命中的条目"""
+        keys = {}
+        for text in texts:
+            keys.setdefault(self.normalize(text), []).append(text)
+
+        found = {}
+        with self._lock:
+            key_list = list(keys)
+            # 分段查询，避免超过 sqlite 的参数数量上限
+            for i in range(0, len(key_list), 500):
+                chunk = key_list[i:i+500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text, translation FROM memory"
+                    f" WHERE source=? AND target=? AND text IN ({placeholders})",
+                    [source, target, *chunk]
+                ).fetchall()
+                for key, translation in rows:
+                    for text in keys[key]:
+                        found[text] = translation
+
+            # 更新命中条目的使用时间
+            if found:
+                touched = {self.normalize(text) for text in found}
+                self._conn.executemany(
+                    "UPDATE memory SET last_used=? WHERE source=? AND target=? AND text=?",
+                    [(self._tick(), source, target, key) for key in touched]
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+        return found
+
+    def put(self, source, target, text, translation):
+        """写入单条译文"""
+        self.put_many(source, target, {text: translation})
+
+    def put_many(self, source, target, translations):
+        """批量写入译文 {原文: 译文}"""
+        if not translations:
+            return
+        with self._lock:
+            rows = [(source, target, self.normalize(text), translation, self._tick())
+                    for text, translation in translations.items()]
+            # 先插入新条目（rowcount 即新增数量），再更新已存在条目的译文和使用时间
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO memory (source, target, text, translation, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._count += max(cursor.rowcount, 0)
+            self._conn.executemany(
+                "UPDATE memory SET translation=?, last_used=? WHERE source=? AND target=? AND text=?",
+                [(translation, used, source, target, key) for source, target, key, translation, used in rows]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """超出容量时淘汰最近最少使用的条目（调用方需持有锁）"""
+        excess = self._count - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM memory WHERE rowid IN"
+            " (SELECT rowid FROM memory ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self._count -= excess
+
+    def __len__(self):
+        return self._count
+
+    def stats(self):
+        """返回命中统计"""
+        total = self.hits + self.misses
+        return {
+            'entries': self._count,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+    def export_to(self, path):
+        """导出记忆库，根据扩展名选择格式：.csv 或 .jsonl"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source, target, text, translation FROM memory ORDER BY last_used"
+            ).fetchall()
+        if path.lower().endswith('.csv'):
+            with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['source', 'target', 'text', 'translation'])
+                writer.writerows(rows)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                for source, target, text, translation in rows:
+                    f.write(json.dumps({'source': source, 'target': target,
+                                        'text': text, 'translation': translation},
+                                       ensure_ascii=False) + '\n')
+        return len(rows)
+
+    def import_from(self, path):
+        """从 .csv 或 .jsonl 文件导入条目，返回导入数量"""
+        grouped = {}
+        if path.lower().endswith('.csv'):
+            with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+                records = list(csv.DictReader(f))
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        for record in records:
+            key = (record['source'], record['target'])
+            grouped.setdefault(key, {})[record['text']] = record['translation']
+        for (source, target), translations in grouped.items():
+            self.put_many(source, target, translations)
+        return len(records)
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+class JobJournal:
+    """任务日志：逐步记录已完成的 (原文 → 译文)
+
+    日志为 JSON Lines 文件，保存在输出文件旁边。任务被取消、崩溃或网络失败后，
+    再次处理同一输入文件时会读取日志，跳过已经完成的翻译。
+    输出文件在最后一次性写出，恢复时所有工作表仍会重新读取和组装，只是不再发送已完成的翻译请求
+    """
+
+    def __init__(self, path, input_file, mode):
+        self.path = path
+        self.translations = {}        # {(源语言, 目标语言, 原文): 译文}
+        self.resumed = False          # 是否从已有日志恢复
+        self._lock = threading.Lock()
+        self._last_sync = time.monotonic()
+
+        stat = os.stat(input_file)
+        header = {
+            'type': 'job',
+            'input': os.path.abspath(input_file),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'mode': mode
+        }
+        if os.path.exists(path) and self._load(header):
+            self.resumed = True
+            self._truncate_torn_line()
+            self._file = open(path, 'a', encoding='utf-8')
+        else:
+            # 输入文件或翻译模式变化时，旧日志作废
+            self._file = open(path, 'w', encoding='utf-8')
+            self._write(header)
+
+    def _load(self, header):
+        """读取已有日志，与当前任务不匹配时返回 False"""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        if not lines:
+            return False
+        try:
+            first = json.loads(lines[0])
+        except ValueError:
+            return False
+        if {k: first.get(k) for k in header} != header:
+            return False
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 崩溃时最后一行可能不完整，忽略即可
+                continue
+            if record.get('type') == 'pair':
+                self.translations[(record['source'], record['target'], record['text'])] = record['translation']
+        return True
+
+    def _truncate_torn_line(self):
+        """崩溃时写了一半的最后一行截掉，否则新记录会接在这行后面，读取时一起被丢弃"""
+        with open(self.path, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            end = size
+            while end > 0:
+                start = max(0, end - 65536)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b'\n')
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end < size:
+                f.truncate(end)
+
+    def _write(self, record):
+        """追加一条记录（调用方需持有锁或在初始化阶段调用）"""
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def _flush(self, force=False):
+        """刷新到磁盘，fsync 最多每秒一次（调用方需持有锁）"""
+        self._file.flush()
+        now = time.monotonic()
+        if force or now - self._last_sync >= 1:
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+
+    def get_many(self, source, target, texts):
+        """查询已完成的译文，返回 {原文: 译文}"""
+        found = {}
+        for text in texts:
+            translation = self.translations.get((source, target, text))
+            if translation is not None:
+                found[text] = translation
+        return found
+
+    def put_many(self, source, target, translations):
+        """记录新完成的译文 {原文: 译文}"""
+        with self._lock:
+            for text, translation in translations.items():
+                self.translations[(source, target, text)] = translation
+                self._write({'type': 'pair', 'source': source, 'target': target,
+                             'text': text, 'translation': translation})
+            self._flush()
+
+    def close(self, remove=False):
+        """关闭日志，remove 为 True 时删除日志文件（任务已全部完成）"""
+        with self._lock:
+            if not self._file.closed:
+                self._flush(force=True)
+                self._file.close()
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
+
+class IncrementalIndex:
+    """增量翻译索引：上一次运行的 (原文内容哈希 → 译文)
+
+    可以从上一次的翻译输出（原始列和紧随其后的 _EN 列）或内容哈希清单（.json）加载，
+    作为缓存层接入翻译流程：未变化的值直接复用上一次的译文，只有新增或修改的值才发送请求。
+    上一次译文与原文相同（未翻译或翻译失败）的值不复用，会重新翻译
+    """
+
+    VERSION = 1
+
+    def __init__(self, mode=None):
+        self.mode = mode
+        self.entries = {}  # {原文哈希: 译文}
+        self.used = {}     # 本次运行用到和新增的条目，写清单时只保留这些
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(text):
+        """原文的内容哈希"""
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+    @classmethod
+    def load(cls, path, mode=None):
+        """按扩展名加载：.json 为清单，其他为上一次的翻译输出"""
+        if path.lower().endswith('.json'):
+            return cls.from_manifest(path, mode)
+        return cls.from_output(path, mode)
+
+    @classmethod
+    def from_output(cls, path, mode=None):
+        """从上一次的翻译输出加载：每个原始列后面紧跟着对应的 _EN 列"""
+        index = cls(mode)
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            for worksheet in workbook.worksheets:
+                rows = worksheet.iter_rows(values_only=True)
+                header = next(rows, None)
+                if not header:
+                    continue
+                pairs = [i for i in range(len(header) - 1)
+                         if header[i] is not None and header[i + 1] == f"{header[i]}_EN"]
+                for row in rows:
+                    for i in pairs:
+                        if i + 1 >= len(row):
+                            break
+                        source, translation = row[i], row[i + 1]
+                        if isinstance(source, str) and isinstance(translation, str) and source != translation:
+                            index.entries[cls.digest(source)] = translation
+        finally:
+            workbook.close()
+        return index
+
+    @classmethod
+    def from_manifest(cls, path, mode=None):
+        """从内容哈希清单加载，翻译模式不一致时返回空索引"""
+        index = cls(mode)
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != cls.VERSION or (mode and manifest.get('mode') != mode):
+            logger.warning("[增量] 清单 %s 与当前翻译模式不一致，忽略", path)
+            return index
+        index.entries = manifest.get('entries', {})
+        return index
+
+    def save_manifest(self, path):
+        """写出本次运行的内容哈希清单（先写临时文件再替换，避免写到一半损坏）"""
+        with self._lock:
+            manifest = {'version': self.VERSION, 'mode': self.mode, 'entries': dict(self.used)}
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_many(self, source, target, texts):
+        """查询上一次的译文，返回 {原文: 译文}"""
+        found = {}
+        with self._lock:
+            for text in texts:
+                key = self.digest(text)
+                translation = self.entries.get(key)
+                if translation is not None:
+                    found[text] = translation
+                    self.used[key] = translation
+            self.hits += len(found)
+        return found
+
+    def put_many(self, source, target, translations):
+        """记录本次新翻译的译文 {原文: 译文}"""
+        with self._lock:
+            for text, translation in translations.items():
+                key = self.digest(text)
+                self.entries[key] = translation
+                self.used[key] = translation
+
+class ProgressReporter:
+    """进度汇报：把高频的进度更新合并为固定频率的回调
+
+    状态文本可以传入无参函数，只有真正发送给回调时才格式化，
+    翻译热循环不承担字符串格式化和ETA计算的开销
+    """
+
+    def __init__(self, callback, interval=0.2):
+        """interval 为两次回调之间的最小间隔（秒）"""
+        self.callback = callback
+        self.interval = interval
+        self._last_emit = 0.0
+        self._pending = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def wrap(cls, callback, interval=0.2):
+        """把普通回调包装为 ProgressReporter（已经包装过的、以及阶段进度直接返回）"""
+        if callback is None or isinstance(callback, (cls, ProgressPhase)):
+            return callback
+        return cls(callback, interval)
+
+    def phase(self, start, end):
+        """返回一个阶段的进度回调：阶段内 0-100 的进度映射到总进度的 [start, end] 区间"""
+        return ProgressPhase(self, start, end)
+
+    def __call__(self, progress, status, force=False):
+        """提交最新进度，status 可以是字符串或返回字符串的函数；force 为 True 时立即发送"""
+        now = time.monotonic()
+        with self._lock:
+            self._pending = (progress, status)
+            if not force and now - self._last_emit < self.interval:
+                return
+            self._last_emit = now
+            pending, self._pending = self._pending, None
+        self._emit(*pending)
+
+    def flush(self):
+        """发送尚未发送的最新进度"""
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._last_emit = time.monotonic()
+        if pending:
+            self._emit(*pending)
+
+    def _emit(self, progress, status):
+        if callable(status):
+            status = status()
+        self.callback(progress, status)
+
+class ProgressPhase:
+    """总进度中的一个阶段：多个阶段依次占用总进度的不同区间，进度条不会在阶段切换时回到 0"""
+
+    def __init__(self, reporter, start, end):
+        self.reporter = reporter
+        self.start = start
+        self.end = end
+
+    def __call__(self, progress, status, force=False):
+        self.reporter(self.start + (self.end - self.start) * progress / 100, status, force)
+
+    def flush(self):
+        self.reporter.flush()
+
+class TranslationMetrics:
+    """运行指标：各阶段耗时、请求数、重试、缓存命中、发送字节数和请求延迟分位数
+
+    所有方法都是线程安全的。阶段耗时为墙钟时间；rate_wait（限速和退避等待）
+    在工作线程中累计，是所有线程等待时间之和。运行结束后可导出为 JSON 或 Prometheus 文本
+    """
+
+    COUNTERS = ('requests', 'retries', 'failures', 'throttled', 'cache_hits', 'cache_misses',
+                'bytes_sent', 'cells_skipped')
+
+    def __init__(self, max_samples=100000):
+        """max_samples 为保留的延迟样本上限，超出后使用蓄水池抽样"""
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空所有指标"""
+        with self._lock:
+            self.stages = {}  # {阶段名: 累计秒数}
+            self.counters = dict.fromkeys(self.COUNTERS, 0)
+            self.latencies = []  # 请求延迟样本（秒）
+            self.latency_count = 0
+            self.latency_sum = 0.0
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """计时上下文：把代码块的耗时累加到阶段 name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        """累加阶段耗时"""
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def incr(self, name, amount=1):
+        """计数器加 amount"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe_latency(self, seconds):
+        """记录一次请求的延迟"""
+        with self._lock:
+            self.latency_count += 1
+            self.latency_sum += seconds
+            if len(self.latencies) < self.max_samples:
+                self.latencies.append(seconds)
+            else:
+                slot = random.randrange(self.latency_count)
+                if slot < self.max_samples:
+                    self.latencies[slot] = seconds
+
+    @staticmethod
+    def percentile(ordered, q):
+        """最近秩法计算分位数，ordered 为升序列表"""
+        if not ordered:
+            return None
+        rank = max(1, math.ceil(q / 100 * len(ordered)))
+        return round(ordered[rank - 1], 6)
+
+    def snapshot(self, include_samples=False):
+        """返回指标字典；include_samples 为 True 时附带原始延迟样本（用于跨进程合并）"""
+        with self._lock:
+            ordered = sorted(self.latencies)
+            snapshot = {
+                'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                'counters': dict(self.counters),
+                'latency': {
+                    'count': self.latency_count,
+                    'sum': round(self.latency_sum, 4),
+                    'mean': round(self.latency_sum / self.latency_count, 4) if self.latency_count else None,
+                    'p50': self.percentile(ordered, 50),
+                    'p95': self.percentile(ordered, 95),
+                    'p99': self.percentile(ordered, 99),
+                    'max': round(ordered[-1], 6) if ordered else None
+                }
+            }
+            if include_samples:
+                snapshot['latency_samples'] = list(self.latencies)
+        return snapshot
+
+    def merge(self, snapshot):
+        """合并另一份指标快照（来自其他文件或进程）"""
+        with self._lock:
+            for name, seconds in snapshot.get('stages', {}).items():
+                self.stages[name] = self.stages.get(name, 0.0) + seconds
+            for name, value in snapshot.get('counters', {}).items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            latency = snapshot.get('latency', {})
+            self.latency_count += latency.get('count', 0)
+            self.latency_sum += latency.get('sum', 0.0)
+            samples = snapshot.get('latency_samples', [])
+            self.latencies.extend(samples[:max(0, self.max_samples - len(self.latencies))])
+
+    def to_json(self):
+        """导出为 JSON 文本"""
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix='excel_translator'):
+        """导出为 Prometheus 文本格式"""
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {prefix}_stage_seconds gauge"]
+        for name, seconds in sorted(snapshot['stages'].items()):
+            lines.append(f'{prefix}_stage_seconds{{stage="{name}"}} {seconds}')
+        for name, value in snapshot['counters'].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        latency = snapshot['latency']
+        lines.append(f"# TYPE {prefix}_request_latency_seconds summary")
+        for quantile, key in (('0.5', 'p50'), ('0.95', 'p95'), ('0.99', 'p99')):
+            if latency[key] is not None:
+                lines.append(f'{prefix}_request_latency_seconds{{quantile="{quantile}"}} {latency[key]:.6f}')
+        lines.append(f"{prefix}_request_latency_seconds_sum {latency['sum']}")
+        lines.append(f"{prefix}_request_latency_seconds_count {latency['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path):
+        """写入文件：.prom / .txt 为 Prometheus 文本格式，其他为 JSON"""
+        text = self.to_prometheus() if path.lower().endswith(('.prom', '.txt')) else self.to_json()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+class PooledGoogleTranslator:
+    """复用 HTTP 长连接的 GoogleTranslator
+
+    原版每次 translate 都调用 requests.get，会重新建立 TCP/TLS 连接；
+    这里改用持久的 requests.Session，请求逻辑与原版保持一致。
+    内部持有一个 GoogleTranslator 提供语言代码和请求参数（而不是继承它），
+    deep_translator 在第一次创建客户端时才导入
+    """
+
+    def __init__(self, source='auto', target='en', session=None, timeout=10, **kwargs):
+        self.client = deep_translator.GoogleTranslator(source=source, target=target, **kwargs)
+        self.session = session if session is not None else requests.Session()
+        self.timeout = timeout
+
+    def translate(self, text, **kwargs):
+        """翻译文本"""
+        client = self.client
+        if not translator_validate.is_input_valid(text, max_chars=5000):
+            return text
+        text = text.strip()
+        if client._same_source_target() or translator_validate.is_empty(text):
+            return text
+
+        params = dict(client._url_params)
+        params.update({'tl': client._target, 'sl': client._source, client.payload_key: text})
+        response = self.session.get(client._base_url, params=params,
+                                    proxies=client.proxies, timeout=self.timeout)
+        if response.status_code == 429:
+            raise translator_errors.TooManyRequests()
+        if translator_validate.request_failed(status_code=response.status_code):
+            raise translator_errors.RequestError()
+
+        soup = bs4.BeautifulSoup(response.text, 'html.parser')
+        element = soup.find(client._element_tag, client._element_query)
+        if not element:
+            element = soup.find(client._element_tag, client._alt_element_query)
+            if not element:
+                raise translator_errors.TranslationNotFound(text)
+        return element.get_text(strip=True)
+
+class TranslatorClientPool:
+    """翻译客户端池：每个工作线程、每个 (源语言, 目标语言) 保持一个长期存在的客户端
+
+    客户端和 HTTP 会话都按线程隔离，GoogleTranslator 内部会修改请求参数，
+    requests.Session 也不保证线程安全，因此不在线程之间共享
+    """
+
+    def __init__(self, client_class=PooledGoogleTranslator):
+        self.client_class = client_class
+        self._local = threading.local()
+
+    def get(self, source, target):
+        """获取当前线程的客户端，不存在时创建"""
+        local = self._local
+        if not hasattr(local, 'clients'):
+            local.clients = {}
+            local.session = requests.Session()
+        client = local.clients.get((source, target))
+        if client is None:
+            client = self.client_class(source=source, target=target, session=local.session)
+            local.clients[(source, target)] = client
+        return client
+
+class TranslationBackend:
+    """翻译后端接口
+
+    子类实现 translate（以及可选的 translate_batch），并通过类属性声明能力：
+    - max_chars: 单次请求的最大字符数（None 表示不限制）
+    - supports_batch: translate_batch 是否原生支持一次翻译多条
+    - supports_packing: 是否可以把多条文本用换行拼成一次请求（服务端保留换行）
+    - requires_network: 是否访问网络（决定是否经过全局限速器、是否计入请求指标）
+    - supports_any_text: 是否能翻译任意文本（术语表只能翻译表中的条目），只有这样的后端才能作为限流时的转移目标
+
+    translate 返回 None 表示该后端无法翻译这条文本（例如术语表中没有），
+    由后端链中的下一个后端继续处理；抛出 TooManyRequests 表示被限流，触发故障转移
+    """
+
+    name = 'base'
+    max_chars = 5000
+    supports_batch = False
+    supports_packing = False
+    requires_network = False
+    supports_any_text = True
+
+    def __init__(self):
+        self._throttled_until = 0.0
+
+    def supports(self, source, target):
+        """是否支持该语言方向"""
+        return True
+
+    def available(self):
+        """是否可用（被限流后冷却期内不可用）"""
+        return time.monotonic() >= self._throttled_until
+
+    def cool_down(self, seconds):
+        """被限流后在 seconds 秒内不再优先使用该后端"""
+        self._throttled_until = max(self._throttled_until, time.monotonic() + seconds)
+
+    def translate(self, text, source, target):
+        """翻译单条文本，无法翻译时返回 None"""
+        raise NotImplementedError
+
+    def translate_batch(self, texts, source, target):
+        """翻译多条文本，返回与 texts 等长的列表；默认逐条调用 translate"""
+        return [self.translate(text, source, target) for text in texts]
+
+    async def translate_async(self, text, source, target):
+        """异步翻译单条文本（默认在线程中执行 translate）"""
+        return await asyncio.to_thread(self.translate, text, source, target)
+
+    async def translate_batch_async(self, texts, source, target):
+        """异步翻译多条文本（默认在线程中执行 translate_batch）"""
+        return await asyncio.to_thread(self.translate_batch, texts, source, target)
+
+class GoogleBackend(TranslationBackend):
+    """Google 翻译（通过 TranslatorClientPool 复用每个线程的客户端和长连接）"""
+
+    name = 'google'
+    max_chars = 5000
+    supports_packing = True
+    requires_network = True
+
+    def __init__(self, clients=None):
+        super().__init__()
+        self.clients = clients if clients is not None else TranslatorClientPool()
+
+    def translate(self, text, source, target):
+        result = self.clients.get(source, target).translate(text=text)
+        return result if isinstance(result, str) else None
+
+class GlossaryBackend(TranslationBackend):
+    """术语表：整个单元格精确匹配（按 TranslationMemory.normalize 规范化），并用字典树查找文本中嵌入的术语，不访问网络
+
+    放在后端链中时作为普通后端使用；设置为 ExcelTranslator.glossary 时，精确匹配的值不经过缓存和网络，
+    文本中嵌入的术语在发送前替换为术语译文（substitute），或替换为占位符、译后还原（protect），
+    保证同一术语在所有单元格中译法一致
+    """
+
+    name = 'glossary'
+    max_chars = None
+    supports_batch = True
+    supports_any_text = False
+
+    MODES = ('substitute', 'protect')
+    PLACEHOLDER = '__T{}__'
+    PLACEHOLDER_PATTERN = re.compile(r'__\s*[Tt]\s*(\d+)\s*__')
+    WORD_CHAR = re.compile(r'[A-Za-z0-9_]')
+    TERMINAL = ''  # 字典树节点中标记术语结尾的键（不会与单个字符冲突）
+
+    def __init__(self, entries=None, mode='substitute', min_term_length=2):
+        """entries 为 {(源语言, 目标语言): {原文: 译文}}；min_term_length 为在文本中查找的术语最小长度"""
+        super().__init__()
+        if mode not in self.MODES:
+            raise ValueError(f"未知的术语处理方式: {mode}（可用 {', '.join(self.MODES)}）")
+        self.mode = mode
+        self.min_term_length = min_term_length
+        self.entries = {}
+        self._indexes = {}  # {(源语言, 目标语言): 字典树}，首次查找时构建
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.embedded_texts = 0
+        self.term_hits = {}  # {术语: 在文本中命中的次数}
+        for (source, target), translations in (entries or {}).items():
+            self.add(source, target, translations)
+
+    def add(self, source, target, translations):
+        """添加术语 {原文: 译文}"""
+        table = self.entries.setdefault((source, target), {})
+        for text, translation in translations.items():
+            table[TranslationMemory.normalize(text)] = translation
+        with self._lock:
+            self._indexes.pop((source, target), None)
+
+    @classmethod
+    def load(cls, path, mode='substitute'):
+        """从 .csv 或 .jsonl 文件加载术语表，mode 为嵌入术语的处理方式
+
+        支持翻译记忆库的导出格式（source, target, text, translation），
+        也支持只有中文、英文两列的 CSV（第一列中文，第二列英文，两个方向都可用）
+        """
+        if path.lower().endswith('.csv'):
+            with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+                rows = list(csv.reader(f))
+            header, rows = (rows[0], rows[1:]) if rows else ([], [])
+            records = [dict(zip(header, row)) for row in rows]
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            header = list(records[0]) if records else []
+
+        backend = cls(mode=mode)
+        if {'source', 'target', 'text', 'translation'} <= set(header):
+            for record in records:
+                backend.add(record['source'], record['target'], {record['text']: record['translation']})
+        else:
+            zh_key, en_key = header[:2]
+            pairs = {record[zh_key]: record[en_key] for record in records if record.get(zh_key) and record.get(en_key)}
+            backend.add('zh-CN', 'en', pairs)
+            backend.add('en', 'zh-CN', {en: zh for zh, en in pairs.items()})
+        return backend
+
+    def __len__(self):
+        return sum(len(table) for table in self.entries.values())
+
+    def supports(self, source, target):
+        return (source, target) in self.entries
+
+    def translate(self, text, source, target):
+        return self.entries.get((source, target), {}).get(TranslationMemory.normalize(text))
+
+    def translate_batch(self, texts, source, target):
+        table = self.entries.get((source, target), {})
+        return [table.get(TranslationMemory.normalize(text)) for text in texts]
+
+    def lookup_many(self, texts, source, target):
+        """精确匹配一组文本（英文不区分大小写），返回 {原文: 术语译文}，并计入命中统计"""
+        table = self.entries.get((source, target))
+        if not table:
+            return {}
+        root = self.index(source, target)
+        found = {}
+        for text in texts:
+            key = TranslationMemory.normalize(text)
+            translation = table.get(key)
+            if translation is None:
+                # 沿字典树走完整个文本，正好停在术语结尾即为（忽略大小写的）整格匹配
+                node = root
+                for char in key.lower():
+                    node = node.get(char)
+                    if node is None:
+                        break
+                else:
+                    translation = node.get(self.TERMINAL, (None, None))[1]
+            if translation is not None:
+                found[text] = translation
+        with self._lock:
+            self.exact_hits += len(found)
+        return found
+
+    def index(self, source, target):
+        """该语言方向的字典树（按小写构建，英文术语不区分大小写），节点为 {字符: 子节点}"""
+        with self._lock:
+            root = self._indexes.get((source, target))
+            if root is not None:
+                return root
+            root = {}
+            for term, translation in self.entries.get((source, target), {}).items():
+                key = term.lower()
+                if len(key) < self.min_term_length or len(key) != len(term):
+                    continue
+                node = root
+                for char in key:
+                    node = node.setdefault(char, {})
+                node[self.TERMINAL] = (term, translation)
+            self._indexes[(source, target)] = root
+            return root
+
+    def find_terms(self, text, source, target):
+        """在文本中查找术语（从左到右，同一位置取最长的术语，互不重叠）
+
+        以英文字母或数字开头/结尾的术语只在词边界处匹配；返回 [(起始, 结束, 术语, 译文), ...]
+        """
+        root = self.index(source, target)
+        folded = text.lower()
+        if not root or len(folded) != len(text):
+            return []
+        matches = []
+        length = len(folded)
+        i = 0
+        while i < length:
+            node = root.get(folded[i])
+            if node is None:
+                i += 1
+                continue
+            best = None
+            j = i + 1
+            while True:
+                found = node.get(self.TERMINAL)
+                if found is not None and self._at_boundary(folded, i, j):
+                    best = (i, j) + found
+                if j >= length:
+                    break
+                node = node.get(folded[j])
+                if node is None:
+                    break
+                j += 1
+            if best:
+                matches.append(best)
+                i = best[1]
+            else:
+                i += 1
+        return matches
+
+    def _at_boundary(self, text, start, end):
+        """英文术语两端不能紧挨着字母或数字（避免 cat 匹配 category）"""
+        word = self.WORD_CHAR
+        if word.match(text[start]) and start > 0 and word.match(text[start - 1]):
+            return False
+        return not (word.match(text[end - 1]) and end < len(text) and word.match(text[end]))
+
+    def prepare(self, text, source, target, mode=None, count=True):
+        """处理文本中嵌入的术语，返回 (发送给后端的文本, 占位符对应的译文列表)
+
+        substitute 方式直接把术语替换为译文，占位符列表为空；protect 方式替换为 __T0__ 形式的占位符；
+        没有术语时原样返回 (text, None)；count 为 False 时不计入命中统计
+        """
+        normalized = unicodedata.normalize('NFKC', text)
+        matches = self.find_terms(normalized, source, target)
+        if not matches:
+            return text, None
+        mode = mode or self.mode
+        parts = []
+        placeholders = []
+        position = 0
+        for start, end, term, translation in matches:
+            parts.append(normalized[position:start])
+            if mode == 'protect':
+                parts.append(self.PLACEHOLDER.format(len(placeholders)))
+                placeholders.append(translation)
+            else:
+                parts.append(translation)
+            position = end
+        parts.append(normalized[position:])
+        if not count:
+            return ''.join(parts), placeholders
+        with self._lock:
+            self.embedded_texts += 1
+            for _, _, term, _ in matches:
+                self.term_hits[term] = self.term_hits.get(term, 0) + 1
+        return ''.join(parts), placeholders
+
+    def restore(self, translation, placeholders):
+        """把译文中的占位符还原为术语译文；占位符缺失或被改动时返回 None"""
+        if not placeholders:
+            return translation
+        seen = set()
+
+        def replace(match):
+            number = int(match.group(1))
+            if number >= len(placeholders):
+                return match.group(0)
+            seen.add(number)
+            return placeholders[number]
+
+        restored = self.PLACEHOLDER_PATTERN.sub(replace, translation)
+        return restored if len(seen) == len(placeholders) else None
+
+    def reset_stats(self):
+        """清空命中统计"""
+        with self._lock:
+            self.exact_hits = 0
+            self.embedded_texts = 0
+            self.term_hits = {}
+
+    def stats(self, top=10):
+        """命中统计：精确匹配次数、含嵌入术语的文本数、术语命中总次数和最常命中的术语"""
+        with self._lock:
+            ranked = sorted(self.term_hits.items(), key=lambda item: item[1], reverse=True)[:top]
+            return {
+                'terms': len(self),
+                'exact_hits': self.exact_hits,
+                'embedded_texts': self.embedded_texts,
+                'term_hits': sum(self.term_hits.values()),
+                'top_terms': [{'term': term, 'hits': hits} for term, hits in ranked]
+            }
+
+class ArgosBackend(TranslationBackend):
+    """本地离线翻译：Argos Translate（基于 CTranslate2，在 CPU 上运行）
+
+    需要安装 argostranslate 以及对应方向的语言包，例如：
+        pip install argostranslate
+        argospm install translate-zh_en
+    """
+
+    name = 'argos'
+    max_chars = None
+
+    # 本程序的语言代码 -> Argos 语言代码
+    LANGUAGE_CODES = {'zh-CN': 'zh', 'en': 'en'}
+
+    def __init__(self):
+        super().__init__()
+        try:
+            self._module = importlib.import_module('argostranslate.translate')
+        except ImportError as e:
+            raise ImportError("使用本地翻译后端需要先安装 argostranslate: pip install argostranslate") from e
+        self._translations = {}
+        self._lock = threading.Lock()  # 模型推理串行执行，CTranslate2 内部使用多线程
+
+    def _translation(self, source, target):
+        """获取已安装的语言方向，未安装时返回 None"""
+        key = (source, target)
+        if key not in self._translations:
+            languages = {language.code: language for language in self._module.get_installed_languages()}
+            from_language = languages.get(self.LANGUAGE_CODES.get(source, source))
+            to_language = languages.get(self.LANGUAGE_CODES.get(target, target))
+            translation = from_language.get_translation(to_language) if from_language and to_language else None
+            self._translations[key] = translation
+        return self._translations[key]
+
+    def supports(self, source, target):
+        with self._lock:
+            return self._translation(source, target) is not None
+
+    def translate(self, text, source, target):
+        with self._lock:
+            translation = self._translation(source, target)
+            return translation.translate(text) if translation else None
+
+# 超长文本分段时的句子边界（捕获句间分隔符）：中文句末标点后的任意空白，英文句末标点后至少一个空白
+SENTENCE_BOUNDARY = re.compile(r'((?<=[。！？；…])\s*|(?<=[.!?;])\s+)')
+SENTENCE_END_MARKS = tuple('。！？；…')  # 后面可以不跟空白的句末标点
+
+# 视为拥塞信号的错误：限流、服务端错误、超时和连接失败
+def congestion_errors():
+    """表示服务端拥塞的异常类型（限流、请求失败、超时、连接错误），用到时才导入 deep_translator 和 requests"""
+    return (translator_errors.TooManyRequests, translator_errors.RequestError,
+            requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+
+# 可选的翻译后端，按名称选择
+BACKENDS = ('google', 'glossary', 'argos')
+
+class RateLimiter:
+    """全局自适应限速器（令牌桶 + AIMD + 熔断），在所有翻译工作线程之间共享
+
+    - 按当前速率发放令牌；每次成功的请求让速率加性增长，直到配置的上限 max_rate
+    - 观察到限流（429）、超时等拥塞信号时速率减半，同一次拥塞（decrease_interval 内）只减一次
+    - 连续 failure_threshold 次拥塞后熔断：所有线程一起暂停 cooldown 秒，之后只放行一个探测请求，
+      探测成功则恢复发送，失败则再次熔断且暂停时间加倍（不超过 max_cooldown）
+    """
+
+    CLOSED = 'closed'        # 正常发送
+    OPEN = 'open'            # 熔断，所有线程暂停
+    HALF_OPEN = 'half_open'  # 暂停结束，只放行一个探测请求
+
+    def __init__(self, rate=5.0, capacity=None, adaptive=True, min_rate=None,
+                 failure_threshold=5, cooldown=1.0, max_cooldown=30.0):
+        """rate 为每秒请求数上限，capacity 为允许的突发请求数；adaptive 为 False 时速率固定（仍保留熔断）"""
+        self.max_rate = rate
+        self.rate = rate  # 当前速率
+        self.min_rate = min_rate if min_rate else min(rate, 0.5)
+        self.capacity = capacity if capacity else max(1.0, rate)
+        self.adaptive = adaptive
+        self.increase = 1.0  # 每秒成功发送时速率大约增加的值（每次成功增加 increase / rate）
+        self.decrease_interval = 1.0
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = self.CLOSED
+        self.circuit_opened = 0  # 熔断次数
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._open_seconds = cooldown
+        self._consecutive = 0  # 连续拥塞次数
+        self._last_decrease = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        """按经过的时间补充令牌（调用方需持有锁）"""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, cancel_check=None):
+        """获取一个令牌，必要时等待；cancel_check 返回 True 时放弃等待并返回 False
+
+        获取成功后调用方必须用 record_success 或 record_congestion 报告请求结果
+        """
+        while True:
+            if cancel_check and cancel_check():
+                return False
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.state == self.OPEN and now >= self._paused_until:
+                    self.state = self.HALF_OPEN
+                if self.state == self.HALF_OPEN:
+                    if not self._probing:
+                        self._probing = True
+                        return True
+                    wait = 0.1
+                elif now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                else:
+                    wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            # 分段等待，保证取消操作能及时响应
+            time.sleep(min(wait, 0.1))
+
+    def record_success(self):
+        """报告请求得到了服务端的正常响应"""
+        with self._lock:
+            self._consecutive = 0
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self._probing = False
+                self._open_seconds = self.cooldown
+                logger.info("[限速] 探测成功，恢复发送，当前速率 %.1f/秒", self.rate)
+            if self.adaptive and self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.increase / max(self.rate, 1.0))
+
+    def record_congestion(self):
+        """报告一次拥塞信号（限流、超时、服务端错误），返回 True 表示触发了熔断"""
+        with self._lock:
+            now = time.monotonic()
+            self._consecutive += 1
+            if self.adaptive and now - self._last_decrease >= self.decrease_interval:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._last_decrease = now
+                self._tokens = min(self._tokens, 0)
+            if self.state != self.HALF_OPEN and self._consecutive < self.failure_threshold:
+                return False
+            if self.state == self.HALF_OPEN:
+                # 探测失败，暂停时间加倍
+                self._open_seconds = min(self.max_cooldown, self._open_seconds * 2)
+            self.state = self.OPEN
+            self._probing = False
+            self._consecutive = 0
+            self._paused_until = now + self._open_seconds
+            self.circuit_opened += 1
+            logger.warning("[限速] 连续拥塞，所有请求暂停 %.1f 秒，速率降为 %.1f/秒", self._open_seconds, self.rate)
+            return True
+
+class SkipFilter:
+    """跳过过滤器：在翻译前把不需要翻译的单元格标记为原样输出
+
+    内置规则（可单独关闭）和用户自定义正则都按整个单元格内容（去除首尾空白后）完整匹配，
+    整列向量化执行；同时统计每条规则跳过的单元格数
+    """
+
+    # 内置规则：(名称, 正则)
+    BUILTIN_RULES = [
+        ('number', r'[-+]?(?:\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?|\.\d+)(?:[eE][-+]?\d+)?\s*[%‰]?'),
+        ('email', r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+'),
+        ('url', r'(?:https?://|ftp://|www\.)\S+'),
+        ('date', r'\d{4}[-/.年]\d{1,2}[-/.月]\d{1,2}日?(?:[ T]\d{1,2}:\d{2}(?::\d{2})?)?'
+                 r'|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}|\d{1,2}:\d{2}(?::\d{2})?'),
+        # 编号：含数字且带分隔符（SKU-123、A1.2），以数字为主（SKU123、PO2024），或 8 位以上的十六进制串；
+        # Top10、Windows10、H2O、MP3 这类字母为主的词不算编号
+        ('code', r'(?=[A-Za-z0-9_./-]*\d)[A-Za-z0-9]+(?:[-_./][A-Za-z0-9]+)+'
+                 r'|[A-Za-z]{0,3}\d{3,}[A-Za-z]{0,2}|(?=[0-9A-Fa-f]*\d)[0-9A-Fa-f]{8,}'),
+        ('punctuation', r'[\W_]+'),
+    ]
+
+    def __init__(self, patterns=None, disabled_rules=None):
+        """patterns 为用户自定义正则列表，disabled_rules 为要关闭的内置规则名"""
+        self.enabled = True
+        self.disabled_rules = set(disabled_rules or [])
+        self.user_patterns = []
+        for pattern in patterns or []:
+            self.add_pattern(pattern)
+
+    def add_pattern(self, pattern, name=None):
+        """添加自定义跳过规则（正则完整匹配单元格内容时跳过）"""
+        re.compile(pattern)  # 提前检查正则是否有效
+        self.user_patterns.append((name or f"custom:{pattern}", pattern))
+
+    def rules(self):
+        """当前生效的规则列表"""
+        builtin = [(name, pattern) for name, pattern in self.BUILTIN_RULES if name not in self.disabled_rules]
+        return builtin + self.user_patterns
+
+    def apply(self, values, mode='auto', weights=None):
+        """过滤一组值，返回 (需要翻译的值列表, {规则名: 跳过数量})
+
+        weights 为每个值出现的单元格数，给出时按单元格计数，否则按值计数；
+        zh2en / en2zh 模式下，已经是目标语言（不含源语言文字）的值也会被跳过
+        """
+        values = list(values)
+        if not self.enabled or not values:
+            return values, {}
+
+        series = pd.Series(values, dtype=object).str.strip()
+        weights = pd.Series(1 if weights is None else list(weights), index=series.index)
+        skipped = pd.Series(False, index=series.index)
+        counts = {}
+        for name, pattern in self.rules():
+            mask = series.str.fullmatch(pattern, na=False) & ~skipped
+            counts[name] = int(weights[mask].sum())
+            skipped |= mask
+
+        if mode in ('zh2en', 'en2zh') and 'target_language' not in self.disabled_rules:
+            source_pattern = CJK_PATTERN if mode == 'zh2en' else ASCII_LETTER_PATTERN
+            mask = ~series.str.contains(source_pattern, regex=True, na=False) & ~skipped
+            counts['target_language'] = int(weights[mask].sum())
+            skipped |= mask
+
+        keep = (~skipped).to_numpy()
+        return [value for value, flag in zip(values, keep) if flag], {k: v for k, v in counts.items() if v}
+
+class ColumnProfiler:
+    """列画像：在逐值处理之前抽样判断每列的内容类型，规划哪些列需要翻译
+
+    类型：empty（空列）、numeric（数字）、date（日期时间）、code（编号、邮箱、网址等）、
+    cjk（含中文的文本）、text（不含中文的文本）、mixed（中文文本与其他内容混合）。
+    数值、日期类型的列由 dtype 直接判定；其他列在非空值中等间隔抽样，分类类型的列直接检查类别表
+    """
+
+    # 抽样值的分类规则，复用 SkipFilter 的内置正则
+    VALUE_RULES = {name: pattern for name, pattern in SkipFilter.BUILTIN_RULES}
+
+    def __init__(self, sample_size=1000, include=None, exclude=None):
+        """include / exclude 为列名列表（支持 * ? 通配符），include 为空时所有列都是候选"""
+        self.enabled = True  # 关闭后不抽样，只按 include / exclude 筛选列
+        self.sample_size = sample_size
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+
+    def selected(self, column):
+        """按 include / exclude 判断该列是否为候选列"""
+        name = str(column)
+        if self.include and not any(fnmatch.fnmatchcase(name, pattern) for pattern in self.include):
+            return False
+        return not any(fnmatch.fnmatchcase(name, pattern) for pattern in self.exclude)
+
+    @staticmethod
+    def candidates(series):
+        """需要判断的全部值：分类类型的列为类别表，其他列为非空值"""
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return pd.Series(series.cat.categories, dtype=object)
+        return series.dropna()
+
+    def sample(self, series):
+        """在非空值中等间隔抽取最多 sample_size 个值"""
+        values = self.candidates(series)
+        if len(values) > self.sample_size:
+            positions = np.linspace(0, len(values) - 1, self.sample_size).astype(int)
+            values = values.iloc[positions]
+        return values
+
+    def unsampled_cjk(self, series, values):
+        """抽样中没有中文时，检查未抽到的值中是否有含中文的文本
+
+        抽样可能漏掉少量含中文的值（如编号列中的几条中文备注），整列向量化检查一次；
+        有中文时按混合列处理，编号等值在逐值过滤时跳过，只翻译含中文的值
+        """
+        candidates = self.candidates(series)
+        if len(candidates) <= len(values):
+            return False
+        return bool(candidates.astype(object).str.contains(CJK_PATTERN, na=False).any())
+
+    def classify(self, series):
+        """判断一列的类型，返回 (类型, 抽样中是否有含中文的文本, 是否有含英文字母的文本)"""
+        if not series.notna().any():
+            return 'empty', False, False
+        if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+            return 'numeric', False, False
+        if pd.api.types.is_datetime64_any_dtype(series) or pd.api.types.is_timedelta64_dtype(series):
+            return 'date', False, False
+        values = self.sample(series)
+        if values.empty:
+            return 'empty', False, False
+
+        values = values.astype(object)
+        is_str = values.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+        text = values[is_str].str.strip()
+        kinds = set()
+        if not is_str.all():
+            others = values[~is_str]
+            if others.map(lambda value: isinstance(value, (datetime.date, datetime.time))).all():
+                kinds.add('date')
+            else:
+                kinds.add('numeric')
+        text = text[text != '']
+        if text.empty:
+            if self.unsampled_cjk(series, values):
+                return 'mixed', True, False
+            return (kinds.pop() if len(kinds) == 1 else 'code' if kinds else 'empty'), False, False
+
+        numeric = text.str.fullmatch(self.VALUE_RULES['number'])
+        date = text.str.fullmatch(self.VALUE_RULES['date']) & ~numeric
+        code = pd.Series(False, index=text.index)
+        for name in ('email', 'url', 'code', 'punctuation'):
+            code |= text.str.fullmatch(self.VALUE_RULES[name])
+        code &= ~(numeric | date)
+        words = text[~(numeric | date | code)]
+        if numeric.any():
+            kinds.add('numeric')
+        if date.any():
+            kinds.add('date')
+        if code.any():
+            kinds.add('code')
+
+        has_cjk = bool(words.str.contains(CJK_PATTERN).any())
+        has_latin = bool(words.str.contains(ASCII_LETTER_PATTERN).any())
+        if not has_cjk and self.unsampled_cjk(series, values):
+            return 'mixed', True, has_latin
+        if words.empty:
+            kind = kinds.pop() if len(kinds) == 1 else 'code'
+        elif has_cjk and not kinds and words.str.contains(CJK_PATTERN).all():
+            kind = 'cjk'
+        elif has_cjk:
+            kind = 'mixed'
+        else:
+            kind = 'text'
+        return kind, has_cjk, has_latin
+
+    def profile(self, df, mode='auto'):
+        """规划一个工作表：返回 {列名: {'kind': 类型, 'translate': 是否需要翻译}}
+
+        zh2en 模式只翻译抽样中含中文文本的列，en2zh 模式只翻译含英文字母文本的列
+        """
+        profile = {}
+        for column in df.columns:
+            if not self.selected(column):
+                profile[column] = {'kind': 'excluded', 'translate': False}
+                continue
+            if not self.enabled:
+                profile[column] = {'kind': 'unprofiled', 'translate': True}
+                continue
+            kind, has_cjk, has_latin = self.classify(df[column])
+            if mode == 'zh2en':
+                translate = has_cjk
+            elif mode == 'en2zh':
+                translate = has_latin
+            else:
+                translate = kind in ('cjk', 'text', 'mixed')
+            profile[column] = {'kind': kind, 'translate': translate}
+        return profile
+
+CATEGORICAL_MAX_UNIQUE_RATIO = 0.5  # 不同值占比不超过该比例的文本列才转为分类类型
+
+def is_text_column(series):
+    """是否可能包含需要翻译的文本（排除数值、日期类型的列）"""
+    return not (pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series))
+
+def categorize_text_columns(df, max_unique_ratio=CATEGORICAL_MAX_UNIQUE_RATIO):
+    """把重复度高的文本列转为分类类型：每个不同的值只保存一份，行上只保留整数编码
+
+    不同值占比超过 max_unique_ratio 的列保持原样（转换后反而更占内存）
+    """
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype) or not is_text_column(series):
+            continue
+        categorical = series.astype('category')
+        if len(categorical.cat.categories) <= max_unique_ratio * len(series):
+            df[column] = categorical
+    return df
+
+def collect_column_values(df, columns=None):
+    """收集每一列（columns 为 None 时）或指定列中需要翻译的唯一值，返回 {列名: [值, ...]}
+
+    分类类型的列直接读取类别表，不扫描每一行
+    """
+    column_values = {}
+    for column in (df.columns if columns is None else columns):
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            values = series.cat.categories
+        else:
+            values = series.dropna().unique()
+        column_values[column] = [v for v in values if ExcelTranslator.is_translatable(v)]
+    return column_values
+
+def prepare_sheet(df, profiler=None, mode='auto', categorical=False, header_only=False):
+    """解析后的工作表预处理：列画像规划、分类类型转换、收集需要翻译的列中的唯一值
+
+    返回 (DataFrame, {列名: 值列表}, {列名: 列画像})；header_only 时不收集任何单元格的值
+    """
+    profile = profiler.profile(df, mode) if profiler is not None else {}
+    if categorical:
+        df = categorize_text_columns(df)
+    if header_only:
+        columns = []
+    else:
+        columns = [column for column in df.columns if profile.get(column, {'translate': True})['translate']]
+    return df, collect_column_values(df, columns), profile
+
+def _parse_sheet_worker(input_file, sheet_name, profiler=None, mode='auto', categorical=False, header_only=False):
+    """进程池任务：解析一个工作表，规划并收集可翻译的唯一值
+
+    分类类型转换在子进程中完成，传回主进程的数据量也随之减少
+    """
+    df = pd.read_excel(input_file, sheet_name=sheet_name)
+    return prepare_sheet(df, profiler, mode, categorical, header_only)
+
+class WriteOnlyExcelWriter:
+    """openpyxl 只写模式的 DataFrame 写出器：按块逐行写出，不在内存中构建整张表的单元格对象
+
+    表头样式与 pandas 的 to_excel 一致（加粗、细边框、居中）
+    """
+
+    def __init__(self, path, chunk_rows=10000):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.workbook = openpyxl.Workbook(write_only=True)
+        styles = openpyxl.styles
+        side = styles.Side(style='thin')
+        self._header_font = styles.Font(bold=True)
+        self._header_border = styles.Border(left=side, right=side, top=side, bottom=side)
+        self._header_alignment = styles.Alignment(horizontal='center', vertical='top')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+    def _header_cell(self, worksheet, value):
+        cell = openpyxl.cell.WriteOnlyCell(worksheet, value=value)
+        cell.font = self._header_font
+        cell.border = self._header_border
+        cell.alignment = self._header_alignment
+        return cell
+
+    def write(self, df, sheet_name):
+        """写出一个工作表（不含索引列）"""
+        worksheet = self.workbook.create_sheet(title=sheet_name)
+        worksheet.append([self._header_cell(worksheet, column) for column in df.columns])
+        for start in range(0, len(df), self.chunk_rows):
+            # 转为 Python 对象并把 NaN/NaT 换成空单元格
+            part = df.iloc[start:start + self.chunk_rows].astype(object)
+            part = part.where(part.notna(), None)
+            for row in part.itertuples(index=False, name=None):
+                worksheet.append(row)
+
+    def close(self):
+        """保存文件"""
+        self.workbook.save(self.path)
+
+class SidecarWriter:
+    """旁路输出：在 Excel 之外同时写出 CSV、Parquet（每个工作表一个文件）和 JSONL（原文 → 译文对）
+
+    文件与输出文件同名，分别为 <输出>.<工作表>.csv、<输出>.<工作表>.parquet、<输出>.pairs.jsonl
+    """
+
+    FORMATS = ('csv', 'parquet', 'jsonl')
+
+    def __init__(self, output_file, formats):
+        self.base = os.path.splitext(output_file)[0]
+        self.formats = [fmt for fmt in self.FORMATS if fmt in formats]
+        self.paths = []  # 已写出的文件
+        self._pairs_file = None
+        self._seen = set()
+        self._csv_file = None
+        self._csv_writer = None
+
+    def _path(self, suffix):
+        path = f"{self.base}.{suffix}"
+        self.paths.append(path)
+        return path
+
+    @staticmethod
+    def _sheet_suffix(sheet_name):
+        """工作表名中不能出现在文件名里的字符替换为下划线"""
+        return re.sub(r'[\\/:*?"<>|\s]+', '_', str(sheet_name))
+
+    def write_frame(self, df, sheet_name):
+        """写出一个工作表的 CSV / Parquet"""
+        suffix = self._sheet_suffix(sheet_name)
+        if 'csv' in self.formats:
+            df.to_csv(self._path(f"{suffix}.csv"), index=False, encoding='utf-8-sig')
+        if 'parquet' in self.formats:
+            frame = df.copy()
+            frame.columns = [str(column) for column in frame.columns]
+            # Parquet 要求每列类型一致，混合类型的文本列统一转为字符串
+            for column in frame.columns[frame.dtypes == object]:
+                frame[column] = frame[column].map(lambda value: None if pd.isna(value) else str(value))
+            frame.to_parquet(self._path(f"{suffix}.parquet"), index=False)
+
+    def start_sheet(self, sheet_name, header):
+        """流式模式：开始一个工作表的 CSV（Parquet 需要整表数据，流式模式下不输出）"""
+        self._close_csv()
+        if 'csv' in self.formats:
+            self._csv_file = open(self._path(f"{self._sheet_suffix(sheet_name)}.csv"), 'w',
+                                  encoding='utf-8-sig', newline='')
+            self._csv_writer = csv.writer(self._csv_file)
+            self._csv_writer.writerow(header)
+
+    def write_rows(self, rows):
+        """流式模式：追加 CSV 行"""
+        if self._csv_writer:
+            self._csv_writer.writerows(rows)
+
+    def write_pairs(self, pairs):
+        """追加原文 → 译文对（每个原文只写一次，未翻译的值不写）"""
+        if 'jsonl' not in self.formats:
+            return
+        if self._pairs_file is None:
+            self._pairs_file = open(self._path('pairs.jsonl'), 'w', encoding='utf-8')
+        for text, translation in pairs:
+            if text != translation and text not in self._seen:
+                self._seen.add(text)
+                self._pairs_file.write(json.dumps({'text': text, 'translation': translation}, ensure_ascii=False) + '\n')
+
+    def _close_csv(self):
+        if self._csv_file:
+            self._csv_file.close()
+            self._csv_file = None
+            self._csv_writer = None
+
+    def close(self):
+        """关闭所有文件"""
+        self._close_csv()
+        if self._pairs_file:
+            self._pairs_file.close()
+            self._pairs_file = None
+
+# 可选的 Excel 输出引擎：pandas + openpyxl（默认）、openpyxl 只写模式（内存占用低）、xlsxwriter（需要安装）
+OUTPUT_ENGINES = ('openpyxl', 'write_only', 'xlsxwriter')
 
 class ExcelTranslator:
     """Excel文件中英文翻译工具"""
+
+    # 打包请求中每条文本前的编号标记，拆分时按编号逐条对齐（与术语占位符一样容忍空格和大小写变化）
+    PACK_MARKER = '__P{}__ '
+    PACK_MARKER_PATTERN = re.compile(r'__\s*[Pp]\s*(\d+)\s*__')
     
-    def __init__(self):
-        """初始化翻译器和配置"""
+    def __init__(self, memory_path=None, memory_max_entries=500000):
+        """初始化翻译器和配置
+
+        memory_path: 翻译记忆库路径，为 None 时不使用持久化缓存
+        """
         self.translation_mode = 'auto'  # 'zh2en', 'en2zh', 'auto'
+        self.english_ratio = 0.5  # 英文字母占可见字符的比例达到该值时直接判定为英文
+        self.skip_filter = SkipFilter()  # 翻译前的跳过过滤器
+        self.skip_report = {}  # 每列跳过的单元格统计 {工作表: {列名: {'cells': ..., 'skipped': ..., 'rules': {...}}}}
         self.max_retries = 5  # 增加重试次数
-        self.min_delay = 1    # 最小延迟
-        self.max_delay = 5    # 最大延迟
-        self.current_delay = self.min_delay  # 当前延迟
-        self.batch_size = 5   # 批量处理大小
+        self.batch_size = 50  # 每个工作线程每批至少分到的唯一值数量（每批大小见 batch_step，批次之间汇报进度）
+        self.progress_interval = 0.2  # 进度回调的最小间隔（秒）
+        self.translate_progress_share = 80  # 非流式模式下翻译阶段占总进度的百分比，其余为写出阶段
+        self.pack_requests = True  # 把多个短文本打包成一次请求
+        self.batch_separator = '\n'  # 打包时使用的分隔符
+        self.max_request_chars = 2000  # 每个打包请求的最大字符数（GET 请求，需控制URL长度）
+        self.max_items_per_request = 100  # 每个打包请求的最大条目数
+        self._pack_failures = 0  # 打包结果连续对不齐的次数
+        self._pack_disabled = False  # 连续对不齐后本次任务不再打包，每次 process_excel 开始时恢复
+        self._pack_lock = threading.Lock()  # 保护 _pack_failures 和 _pack_disabled，线程池中的多个线程会同时修改
+        self.segment_long_texts = True  # 超过请求字符上限的文本按句子分段翻译后拼回
+        self.max_workers = 4  # 并发翻译线程数
+        self._executor = None  # 长期存在的翻译线程池，线程和其中的客户端、长连接在批次之间复用
+        self._executor_workers = 0
+        self._executor_lock = threading.Lock()
+        self.requests_per_second = 5.0  # 全局请求速率上限
+        self.adaptive_rate = True  # 根据限流信号自动调整实际速率（AIMD）
+        self.rate_limiter = RateLimiter(self.requests_per_second)  # 自适应限速和熔断，替代逐条文本的退避等待
+        self.clients = TranslatorClientPool()  # 复用的翻译客户端
+        self.backends = [GoogleBackend(self.clients)]  # 翻译后端链，按顺序尝试，被限流时转移到下一个
+        self.failover_cooldown = 30  # 后端被限流后暂停使用的时间（秒），有其他后端可用时生效
+        self.glossary = None  # 术语表：精确匹配的值不经过缓存和网络，嵌入的术语在发送前处理
+        self.process_workers = 1  # 并行解析工作表的进程数
+        self.remote = None  # 集中式翻译服务（多进程模式下由主进程统一发送请求）
         self.cancel_flag = False  # 添加取消标志
+        # 持久化翻译记忆库
+        self.memory = TranslationMemory(memory_path, memory_max_entries) if memory_path else None
+        self.dedup_report = None  # 全局去重统计
+        self.resume = True  # 使用任务日志，支持中断后继续
+        self.journal = None  # 当前任务的日志
+        self.incremental = False  # 增量翻译：复用上一次输出（或清单）中未变化的值的译文，并写出清单
+        self.previous_path = None  # 上一次的翻译输出或清单（.json），为 None 时自动查找输出文件旁的清单或输出文件本身
+        self.incremental_index = None  # 当前任务的增量索引
+        self.failed_count = 0  # 本次运行翻译失败（保留原文）的值数量
+        self.output_engine = 'openpyxl'  # Excel 输出引擎，见 OUTPUT_ENGINES
+        self.sidecars = []  # 同时输出的旁路格式，见 SidecarWriter.FORMATS
+        self.profiler = ColumnProfiler()  # 列画像：抽样跳过无需翻译的整列，并按列名筛选
+        self.header_only = False  # 只翻译表头（列名），单元格原样输出
+        self.omit_skipped_columns = False  # 不翻译的列不输出 _EN 副本
+        self.column_report = {}  # 每列画像 {工作表: {列名: {'kind': ..., 'translate': ...}}}
+        self.categorical = False  # 文本列以分类类型加载：只翻译类别表，_EN 列复用编码数组（非流式模式）
+        self.streaming = False  # 强制使用流式读写模式
+        self.streaming_threshold = 10 * 1024 * 1024  # 超过该大小（10MB）自动使用流式模式
+        self.stream_chunk_rows = 5000  # 流式模式每块的行数
+        self.stream_cache_size = 200000  # 流式模式运行内译文缓存的最大条目数
+        self.metrics = TranslationMetrics()  # 运行指标，每次 process_excel 开始时清空
+        self.metrics_path = None  # 运行结束后写出指标的文件（.prom 为 Prometheus 格式，其他为 JSON）
         
     def set_translation_mode(self, mode):
         """设置翻译模式"""
         self.translation_mode = mode
+
+    def _caches(self):
+        """按查询顺序返回可用的译文缓存：任务日志、增量索引、翻译记忆库"""
+        return [cache for cache in (self.journal, self.incremental_index, self.memory) if cache is not None]
+
+    def _backfill_incremental(self, cache, source_lang, target_lang, cached):
+        """其他缓存命中的译文也记入增量索引，保证清单包含本次运行的全部译文"""
+        if cached and self.incremental_index is not None and cache is not self.incremental_index:
+            self.incremental_index.put_many(source_lang, target_lang, cached)
+
+    @staticmethod
+    def manifest_path(output_file):
+        """增量翻译清单的路径（输出文件旁）"""
+        return f"{output_file}.manifest.json"
+
+    def load_incremental(self, output_file):
+        """加载增量索引：优先使用 previous_path，其次是输出文件旁的清单，最后是上一次的输出文件"""
+        path = self.previous_path
+        if path is None:
+            candidates = [self.manifest_path(output_file), output_file]
+            path = next((candidate for candidate in candidates if os.path.exists(candidate)), None)
+        if path is None:
+            logger.info("[增量] 没有找到上一次的输出或清单，全部重新翻译")
+            return IncrementalIndex(self.translation_mode)
+        with self.metrics.stage('incremental'):
+            index = IncrementalIndex.load(path, self.translation_mode)
+        logger.info("[增量] 从 %s 载入 %d 条上一次的译文", path, len(index))
+        return index
+
+    def set_backends(self, names, glossary=None, glossary_mode='substitute'):
+        """按名称设置翻译后端链，如 ['glossary', 'google']
+
+        glossary 为术语表文件路径，指定后即启用术语处理（不论后端链中是否有 glossary），
+        glossary_mode 为嵌入术语的处理方式，见 GlossaryBackend.MODES
+        """
+        self.glossary = GlossaryBackend.load(glossary, glossary_mode) if glossary else None
+        backends = []
+        for name in names:
+            if name == 'google':
+                backends.append(GoogleBackend(self.clients))
+            elif name == 'glossary':
+                if not glossary:
+                    raise ValueError("glossary 后端需要指定术语表文件")
+                backends.append(self.glossary)
+            elif name == 'argos':
+                backends.append(ArgosBackend())
+            else:
+                raise ValueError(f"未知的翻译后端: {name}")
+        if not backends:
+            raise ValueError("至少需要一个翻译后端")
+        self.backends = backends
+
+    def backends_for(self, source_lang, target_lang):
+        """支持该语言方向的后端链"""
+        return [backend for backend in self.backends if backend.supports(source_lang, target_lang)]
+
+    def request_char_limit(self):
+        """打包请求的字符上限：不超过 max_request_chars 和各后端的 max_chars"""
+        limits = [backend.max_chars for backend in self.backends if backend.max_chars]
+        return min([self.max_request_chars] + limits)
+
+    def set_output(self, engine=None, sidecars=None):
+        """设置 Excel 输出引擎和旁路输出格式，缺少可选依赖时抛出 ImportError"""
+        if engine:
+            if engine not in OUTPUT_ENGINES:
+                raise ValueError(f"未知的输出引擎: {engine}")
+            if engine == 'xlsxwriter' and importlib.util.find_spec('xlsxwriter') is None:
+                raise ImportError("使用 xlsxwriter 输出需要先安装: pip install xlsxwriter")
+            self.output_engine = engine
+        if sidecars is not None:
+            unknown = set(sidecars) - set(SidecarWriter.FORMATS)
+            if unknown:
+                raise ValueError(f"未知的旁路输出格式: {', '.join(sorted(unknown))}")
+            if 'parquet' in sidecars and not any(importlib.util.find_spec(name) for name in ('pyarrow', 'fastparquet')):
+                raise ImportError("输出 Parquet 需要先安装 pyarrow: pip install pyarrow")
+            self.sidecars = list(sidecars)
+
+    def open_output(self, output_file):
+        """按输出引擎打开 Excel 写出器（上下文管理器），配合 write_sheet 使用"""
+        if self.output_engine == 'write_only':
+            return WriteOnlyExcelWriter(output_file)
+        return pd.ExcelWriter(output_file, engine=self.output_engine)
+
+    @staticmethod
+    def write_sheet(writer, df, sheet_name):
+        """用 open_output 返回的写出器写出一个工作表"""
+        if isinstance(writer, WriteOnlyExcelWriter):
+            writer.write(df, sheet_name)
+        else:
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+    def set_concurrency(self, max_workers=None, requests_per_second=None, adaptive=None):
+        """设置并发线程数、全局请求速率上限和是否自适应调整速率"""
+        if max_workers:
+            self.max_workers = max(1, int(max_workers))
+        if adaptive is not None:
+            self.adaptive_rate = adaptive
+        if requests_per_second or adaptive is not None:
+            if requests_per_second:
+                self.requests_per_second = float(requests_per_second)
+            self.rate_limiter = RateLimiter(self.requests_per_second, adaptive=self.adaptive_rate)
     
+    def batch_step(self):
+        """每批交给 translate_batch 的唯一值数量
+
+        打包后每个工作线程至少分到两个满载的请求：一个请求结束后线程可以接着处理下一个，
+        不会因为一批只有一两个请求而让其他线程空闲等待
+        """
+        per_request = self.max_items_per_request if self.pack_requests else 1
+        return max(self.batch_size, per_request) * self.max_workers * 2
+
+    def executor(self):
+        """获取翻译线程池，不存在或并发数改变时创建"""
+        with self._executor_lock:
+            if self._executor is not None and self._executor_workers != self.max_workers:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='translate')
+                self._executor_workers = self.max_workers
+            return self._executor
+
+    def shutdown_executor(self):
+        """关闭翻译线程池（任务结束时调用，下次翻译时重新创建）"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
     def detect_language(self, text):
         """检测文本语言，优化处理混合文本"""
-        try:
-            if not isinstance(text, str) or not text.strip():
-                return None
-            
-            # 检查是否包含中文字符
-            has_chinese = any('\u4e00' <= char <= '\u9fff' for char in text)
-            if has_chinese:
-                return 'zh-CN'  # 只要包含中文就返回中文
-            
-            # 使用 langdetect 检测其他语言
-            lang = detect(text)
-            
-            # 标准化语言代码
-            lang_map = {
-                'zh-cn': 'zh-CN',
-                'zh-tw': 'zh-CN',
-                'zh': 'zh-CN',
-                'en': 'en'
-            }
-            return lang_map.get(lang.lower(), lang)
-        except:
+        return self.classify_languages([text])[0]
+
+    def classify_languages(self, values):
+        """向量化语言分类：一次处理整列，返回与 values 等长的语言代码列表（无法判断为 None）
+
+        - 含中文字符：zh-CN
+        - 只含ASCII且英文字母占可见字符的比例不低于 english_ratio：en
+        - 只含ASCII但字母比例较低（编号、型号、数字、符号）：None
+        - 含其他非ASCII字符、真正无法判断的文本才调用 langdetect（结果缓存）
+        """
+        series = pd.Series(list(values), dtype=object)
+        if series.empty:
+            return []
+
+        # 非字符串的值在 str 方法中得到 NaN
+        lengths = series.str.len()
+        stripped = series.str.strip().str.len().fillna(0)
+        has_cjk = series.str.contains(CJK_PATTERN, regex=True, na=False)
+        has_non_ascii = series.str.contains(NON_ASCII_PATTERN, regex=True, na=False)
+        letters = series.str.count(ASCII_LETTER_PATTERN).fillna(0)
+        visible = (lengths - series.str.count(r'\s')).fillna(0)
+        ratio = letters / visible.where(visible > 0, 1)
+
+        english = ~has_cjk & ~has_non_ascii & (letters > 0) & (ratio >= self.english_ratio)
+        ambiguous = (stripped > 0) & ~has_cjk & has_non_ascii
+
+        result = np.full(len(series), None, dtype=object)
+        result[has_cjk.to_numpy()] = 'zh-CN'
+        result[english.to_numpy()] = 'en'
+        for idx in ambiguous.to_numpy().nonzero()[0]:
+            result[idx] = detect_language_cached(series.iat[idx])
+        return result.tolist()
+
+    def resolve_languages_many(self, values):
+        """根据翻译模式为每个值确定 (源语言, 目标语言)，不需要翻译的值为 None"""
+        values = list(values)
+        if self.translation_mode == 'auto':
+            # 自动检测语言：中文译为英文，英文译为中文
+            directions = {'zh-CN': ('zh-CN', 'en'), 'en': ('en', 'zh-CN')}
+            return [directions.get(lang) for lang in self.classify_languages(values)]
+
+        series = pd.Series(values, dtype=object)
+        if series.empty:
+            return []
+        if self.translation_mode == 'zh2en':
+            # 强制中译英：含中文字符才翻译
+            mask = series.str.contains(CJK_PATTERN, regex=True, na=False)
+            direction = ('zh-CN', 'en')
+        else:  # en2zh
+            # 强制英译中：含英文字母才翻译
+            mask = series.str.contains(ASCII_LETTER_PATTERN, regex=True, na=False)
+            direction = ('en', 'zh-CN')
+        return [direction if flag else None for flag in mask.tolist()]
+
+    def resolve_languages(self, text):
+        """根据翻译模式确定源语言和目标语言，不需要翻译时返回 None"""
+        if not self.is_translatable(text):
             return None
+        return self.resolve_languages_many([text])[0]
+
+    def _request(self, text, source_lang, target_lang, backend=None, fallback=False):
+        """通过一个后端翻译单条文本（含重试），失败、无法翻译或取消时返回 None
+
+        backend 省略时使用后端链中的第一个；fallback 为 True 表示后面还有可用的后端，
+        此时被限流不再重试，直接交给下一个后端
+        """
+        if backend is None:
+            chain = self.backends_for(source_lang, target_lang)
+            if not chain:
+                return None
+            backend = chain[0]
+        return self._call_backend(backend, lambda: backend.translate(text, source_lang, target_lang),
+                                  text, fallback)
+
+    def _call_backend(self, backend, call, payload, fallback=False):
+        """调用后端（含重试、限速和指标），返回 call() 的结果，失败或取消时返回 None"""
+        metrics = self.metrics
+        network = backend.requires_network
+        payload_bytes = len(payload.encode('utf-8'))
+        # 本地后端的错误不会因为重试而恢复，只尝试一次
+        attempts = self.max_retries if network else 1
+        for i in range(attempts):
+            if fallback and not backend.available():
+                return None
+            if network:
+                # 通过全局限速器控制请求节奏，取消时立即返回
+                with metrics.stage('rate_wait'):
+                    acquired = self.rate_limiter.acquire(lambda: self.cancel_flag)
+                if not acquired:
+                    logger.debug("[翻译] 检测到取消标志，停止翻译")
+                    return None
+                if i > 0:
+                    metrics.incr('retries')
+                metrics.incr('requests')
+                metrics.incr('bytes_sent', payload_bytes)
+            elif self.cancel_flag:
+                return None
+                
+            start = time.perf_counter()
+            try:
+                result = call()
+                if network:
+                    metrics.observe_latency(time.perf_counter() - start)
+                    self.rate_limiter.record_success()
+                logger.debug("[翻译] %s 完成: %.50s", backend.name, result)
+                return result
+                
+            except Exception as e:
+                congested = isinstance(e, congestion_errors())
+                if network:
+                    metrics.observe_latency(time.perf_counter() - start)
+                    # 拥塞信号由共享的限速器统一处理（降速、熔断），不再逐条文本退避等待；
+                    # 其他错误说明服务端正常响应，不影响速率
+                    if not congested:
+                        self.rate_limiter.record_success()
+                    elif self.rate_limiter.record_congestion():
+                        metrics.incr('circuit_opened')
+                logger.info("[翻译] %s 出错 (尝试 %d/%d): %s", backend.name, i + 1, attempts, type(e).__name__)
+                if self.cancel_flag:
+                    logger.debug("[翻译] 检测到取消标志，停止重试")
+                    return None
+                if isinstance(e, translator_errors.TooManyRequests):
+                    metrics.incr('throttled')
+                    if fallback:
+                        # 被限流且还有其他后端：暂停使用该后端，剩余请求转移到下一个后端
+                        backend.cool_down(self.failover_cooldown)
+                        logger.warning("[翻译] %s 被限流，%d 秒内改用后备后端", backend.name, self.failover_cooldown)
+                        return None
+        
+        metrics.incr('failures')
+        return None
 
     def translate_text(self, text):
         """翻译单条文本"""
@@ -60,264 +1923,1008 @@ class ExcelTranslator:
         if not isinstance(text, str) or not text.strip():
             return text
             
-        print(f"\n[翻译] 开始: {text[:50]}..." if len(text) > 50 else f"\n[翻译] 开始: {text}")
+        logger.debug("[翻译] 开始: %.50s", text)
         
         # 根据翻译模式决定处理方式
-        if self.translation_mode == 'auto':
-            # 自动检测语言
-            source_lang = self.detect_language(text)
-            if not source_lang:
-                return text
-                
-            if source_lang == 'zh-CN':
-                target_lang = 'en'
-                print("[翻译] 检测到中文，翻译为英文")
-            elif source_lang == 'en':
-                target_lang = 'zh-CN'
-                print("[翻译] 检测到英文，翻译为中文")
-            else:
-                return text
-        elif self.translation_mode == 'zh2en':
-            # 强制中译英
-            if any('\u4e00' <= char <= '\u9fff' for char in text):
-                source_lang = 'zh-CN'
-                target_lang = 'en'
-                print("[翻译] 中译英模式")
+        languages = self.resolve_languages(text)
+        if not languages:
+            return text
+        
+        # 与批量翻译走同一流程：查缓存、超长文本分段、发送请求、写回缓存
+        result = self.translate_batch([text], [languages])
+        return result[0] if result else text
+
+    def segment_text(self, text, limit=None):
+        """把超长文本按行和句子边界切分成不超过 limit 个字符的段落
+
+        返回 [(段落, 段落后的原始分隔符), ...]，分隔符保留原文中的换行（含 \r\n）、行尾空白和下一行的缩进，
+        按顺序拼接 段落 + 分隔符 即得到（去除首尾空白后的）原文
+        """
+        limit = limit or self.request_char_limit()
+        segments = []
+        lines = text.strip().split('\n')
+        for line_no, line in enumerate(lines):
+            line_end = '\n' if line_no < len(lines) - 1 else ''
+            if not line.strip():
+                # 空行并入前一段的分隔符
+                if segments:
+                    segments[-1] = (segments[-1][0], segments[-1][1] + line + line_end)
+                continue
+            # 行首缩进并入前一段的分隔符，行尾空白（含 \r）并入本行最后一段的分隔符
+            body = line.strip()
+            indent = line[:len(line) - len(line.lstrip())]
+            if indent and segments:
+                segments[-1] = (segments[-1][0], segments[-1][1] + indent)
+            # 句子和句子之间的分隔符：中文句末标点后的任意空白，英文句末标点后至少一个空白
+            pieces = SENTENCE_BOUNDARY.split(body)
+            sentences = pieces[0::2]
+            separators = pieces[1::2] + [line[len(line.rstrip()):] + line_end]
+            current = ''
+            current_separator = ''
+            for sentence, separator in zip(sentences, separators):
+                while len(sentence) > limit:
+                    # 单个句子超长时在空白处截断，分隔符为截掉的空白；没有空白则直接截断，分隔符为空
+                    cut = sentence.rfind(' ', 0, limit + 1)
+                    cut = cut if cut > 0 else limit
+                    head, rest = sentence[:cut].rstrip(), sentence[cut:].lstrip()
+                    if current:
+                        segments.append((current[:len(current) - len(current_separator)], current_separator))
+                        current = ''
+                    segments.append((head, sentence[len(head):len(sentence) - len(rest)]))
+                    sentence = rest
+                if current and len(current) + len(sentence) > limit:
+                    segments.append((current[:len(current) - len(current_separator)], current_separator))
+                    current = ''
+                current += sentence + separator
+                current_separator = separator
+            if current:
+                segments.append((current[:len(current) - len(current_separator)], current_separator))
+        return [(segment, separator) for segment, separator in segments if segment.strip()] or [(text.strip(), '')]
+
+    @staticmethod
+    def join_segments(segments, translations, target_lang):
+        """按原顺序拼接分段译文：保留换行；译为英文时句子之间补空格，译为中文时去掉句间空格
+
+        在没有空白处硬截断的两段（分隔符为空且不以句末标点结尾）直接相连
+        """
+        output = []
+        last = len(segments) - 1
+        for position, ((segment, separator), translation) in enumerate(zip(segments, translations)):
+            if '\n' not in separator and position < last:
+                if not separator and not segment.endswith(SENTENCE_END_MARKS):
+                    separator = ''
+                else:
+                    separator = ' ' if target_lang == 'en' else ''
+            output.append(translation + separator)
+        return ''.join(output).strip()
+
+    def pack_texts(self, texts):
+        """把短文本打包成若干请求，每个请求不超过字符上限，返回 [[文本, ...], ...]
+
+        含有分隔符（换行）的文本或超长文本单独成组；字符数包含每条文本前的编号标记
+        """
+        packs = []
+        current = []
+        current_chars = 0
+        limit = self.request_char_limit()
+        for text in texts:
+            size = len(text.strip())
+            if self.batch_separator in text.strip() or size > limit:
+                packs.append([text])
+                continue
+            marker = len(self.PACK_MARKER.format(len(current)))
+            extra = size + marker + (len(self.batch_separator) if current else 0)
+            if current and (current_chars + extra > limit
+                            or len(current) >= self.max_items_per_request):
+                packs.append(current)
+                current = []
+                current_chars = 0
+                extra = size + len(self.PACK_MARKER.format(0))
+            current.append(text)
+            current_chars += extra
+        if current:
+            packs.append(current)
+        return packs
+
+    def _translate_pack(self, texts, source_lang, target_lang):
+        """翻译一组文本：先由术语表处理文本中嵌入的术语，再交给后端链
+
+        返回与 texts 等长的列表，失败的条目为 None
+        """
+        if self.remote is not None:
+            return self.remote.translate_pack(texts, source_lang, target_lang)
+        glossary = self.glossary
+        if glossary is None or not glossary.supports(source_lang, target_lang):
+            return self._translate_chain(texts, source_lang, target_lang)
+
+        prepared = [glossary.prepare(text, source_lang, target_lang) for text in texts]
+        self.metrics.incr('glossary_embedded', sum(1 for _, placeholders in prepared if placeholders is not None))
+        results = self._translate_chain([text for text, _ in prepared], source_lang, target_lang)
+        retry = []
+        for idx, ((_, placeholders), translation) in enumerate(zip(prepared, results)):
+            if translation is not None and placeholders:
+                results[idx] = glossary.restore(translation, placeholders)
+                if results[idx] is None:
+                    retry.append(idx)
+        if retry and not self.cancel_flag:
+            # 占位符没有被原样保留时，改为直接替换成术语译文后重新翻译
+            logger.info("[术语] %d 条译文中的占位符无法还原，改为替换术语后重新翻译", len(retry))
+            self.metrics.incr('glossary_restore_failed', len(retry))
+            substituted = [glossary.prepare(texts[idx], source_lang, target_lang, 'substitute', count=False)[0]
+                           for idx in retry]
+            for idx, translation in zip(retry, self._translate_chain(substituted, source_lang, target_lang)):
+                results[idx] = translation
+        return results
+
+    def _translate_chain(self, texts, source_lang, target_lang):
+        """按后端链翻译一组文本：前一个后端无法翻译或被限流的条目交给下一个后端
+
+        返回与 texts 等长的列表，失败的条目为 None
+        """
+        results = [None] * len(texts)
+        pending = list(range(len(texts)))
+        chain = self.backends_for(source_lang, target_lang)
+        for position, backend in enumerate(chain):
+            if not pending or self.cancel_flag:
+                break
+            # 只有能翻译任意文本的后端才能接手被限流的请求；都在冷却时继续使用当前后端，由限速器控制节奏重试
+            fallback = any(other.supports_any_text and other.available() for other in chain[position + 1:])
+            if fallback and not backend.available():
+                continue
+            translated = self._backend_pack(backend, [texts[idx] for idx in pending],
+                                            source_lang, target_lang, fallback)
+            count = 0
+            for idx, translation in zip(pending, translated):
+                if translation is not None:
+                    results[idx] = translation
+                    count += 1
+            self.metrics.incr(f"backend_{backend.name}", count)
+            pending = [idx for idx in pending if results[idx] is None]
+        return results
+
+    def _backend_pack(self, backend, texts, source_lang, target_lang, fallback=False):
+        """用一个后端翻译一组文本：原生批量接口、换行打包成一次请求，或逐条请求
+
+        打包请求失败时整组返回 None；收到结果后按编号标记逐条对齐，对不齐的条目退回逐条请求；
+        返回与 texts 等长的列表，失败的条目为 None
+        """
+        if len(texts) == 1:
+            return [self._request(texts[0], source_lang, target_lang, backend, fallback)]
+        if backend.supports_batch:
+            result = self._call_backend(backend, lambda: backend.translate_batch(texts, source_lang, target_lang),
+                                        ''.join(texts), fallback)
+            return list(result) if result is not None else [None] * len(texts)
+        if not (self.pack_requests and not self._pack_disabled and backend.supports_packing):
+            return [self._request(text, source_lang, target_lang, backend, fallback) for text in texts]
+
+        joined = self.batch_separator.join(self.PACK_MARKER.format(idx) + text.strip()
+                                           for idx, text in enumerate(texts))
+        result = self._request(joined, source_lang, target_lang, backend, fallback)
+        if result is None:
+            # 请求本身失败（超时、限流、后端不可用）：交给重试、转移和失败值处理，不拆成逐条请求
+            return [None] * len(texts)
+        parts = self.split_pack(result, len(texts))
+        missing = [idx for idx, part in enumerate(parts) if part is None]
+        if not missing:
+            with self._pack_lock:
+                self._pack_failures = 0
+            return parts
+
+        if self.cancel_flag or (fallback and not backend.available()):
+            return [None] * len(texts)
+        logger.info("[批量] 打包结果中 %d/%d 条无法对齐，改为逐条翻译", len(missing), len(texts))
+        # 大部分条目都对不齐说明服务端不保留编号标记；连续多次时关闭打包避免浪费请求
+        with self._pack_lock:
+            if len(missing) * 2 > len(texts):
+                self._pack_failures += 1
             else:
-                return text
-        else:  # en2zh
-            # 强制英译中
-            if any(c.isascii() and c.isalpha() for c in text):
-                source_lang = 'en'
-                target_lang = 'zh-CN'
-                print("[翻译] 英译中模式")
+                self._pack_failures = 0
+            if self._pack_failures >= 3 and not self._pack_disabled:
+                logger.warning("[批量] 打包连续失败，本次任务改为逐条请求")
+                self._pack_disabled = True
+        for idx in missing:
+            parts[idx] = self._request(texts[idx], source_lang, target_lang, backend, fallback)
+        return parts
+
+    def split_pack(self, result, count):
+        """按编号标记拆分打包请求的译文，返回长度为 count 的列表
+
+        编号缺失、重复、越界，或者译文为空、含换行（可能混入了其他条目的内容）的条目为 None
+        """
+        matches = list(self.PACK_MARKER_PATTERN.finditer(result))
+        parts = [None] * count
+        seen = set()
+        for position, match in enumerate(matches):
+            idx = int(match.group(1))
+            end = matches[position + 1].start() if position + 1 < len(matches) else len(result)
+            part = result[match.end():end].strip()
+            if idx >= count:
+                continue
+            if idx in seen:
+                parts[idx] = None
+                continue
+            seen.add(idx)
+            if part and self.batch_separator not in part:
+                parts[idx] = part
+        return parts
+
+    def translate_batch(self, texts, languages=None):
+        """批量翻译文本
+
+        按语言方向分组、先查翻译记忆库，剩余文本打包成尽量少的请求，
+        通过线程池并发发送，结果顺序与输入一致；
+        languages 为预先计算好的语言方向（resolve_languages_many 的结果），省略时自动计算
+        """
+        if texts is None or len(texts) == 0:
+            return []
+            
+        text_list = texts.tolist() if hasattr(texts, 'tolist') else list(texts)
+        results = list(text_list)
+        done = [False] * len(text_list)
+        
+        logger.debug("[批量] 开始处理 %d 个文本, 并发数 %d", len(text_list), self.max_workers)
+        
+        # 按 (源语言, 目标语言) 分组，不需要翻译的值原样返回
+        if languages is None:
+            languages = self.resolve_languages_many(text_list)
+        groups = {}
+        for idx, (text, direction) in enumerate(zip(text_list, languages)):
+            if direction and self.is_translatable(text):
+                groups.setdefault(direction, []).append(idx)
             else:
-                return text
+                done[idx] = True
         
-        delay = self.min_delay
-        for i in range(self.max_retries):
-            if self.cancel_flag:
-                print("[翻译] 检测到取消标志，停止翻译")
-                return text
-                
-            try:
-                # 设置源语言和目标语言
-                self.translator = GoogleTranslator(
-                    source=source_lang,
-                    target=target_lang
-                )
-                result = self.translator.translate(text=text)
-                print(f"[翻译] 成功: {result[:50]}..." if len(result) > 50 else f"[翻译] 成功: {result}")
-                return result
-                
-            except Exception as e:
-                print(f"[翻译] 出错 (尝试 {i+1}/{self.max_retries})")
-                print(f"[翻译] 错误类型: {type(e).__name__}")
+        # 查询任务日志和翻译记忆库，生成需要发送的请求
+        tasks = []
+        segment_plans = []  # 分段翻译的超长文本 [(源语言, 目标语言, 原文, 下标列表, 分段), ...]
+        unit_translations = {}  # 每个语言方向已得到的译文（含分段），用于拼接超长文本
+        limit = self.request_char_limit()
+        for (source_lang, target_lang), indices in groups.items():
+            pending = {}
+            for idx in indices:
+                pending.setdefault(text_list[idx], []).append(idx)
+            # 术语表优先于缓存，保证术语译法一致（不受记忆库中旧译文影响）
+            if self.glossary is not None and pending:
+                found = self.glossary.lookup_many(list(pending), source_lang, target_lang)
+                self.metrics.incr('glossary_exact', len(found))
+                for text, translation in found.items():
+                    for idx in pending.pop(text):
+                        results[idx] = translation
+                        done[idx] = True
+            for cache in self._caches():
+                if not pending:
+                    break
+                cached = cache.get_many(source_lang, target_lang, list(pending))
+                self.metrics.incr('cache_hits', len(cached))
+                self._backfill_incremental(cache, source_lang, target_lang, cached)
+                for text, translation in cached.items():
+                    for idx in pending.pop(text):
+                        results[idx] = translation
+                        done[idx] = True
+            self.metrics.incr('cache_misses', len(pending))
+            
+            # 超长文本按句子切分，分段和其他文本一起打包、并发翻译，全部完成后按顺序拼回；
+            # 分段本身也查询和写入缓存，多个单元格共享的段落只翻译一次
+            translated = unit_translations.setdefault((source_lang, target_lang), {})
+            units = {}
+            for text, text_indices in pending.items():
+                if self.segment_long_texts and len(text.strip()) > limit:
+                    segments = self.segment_text(text, limit)
+                    segment_plans.append((source_lang, target_lang, text, text_indices, segments))
+                    for segment, _ in segments:
+                        units.setdefault(segment, [])
+                else:
+                    units.setdefault(text, []).extend(text_indices)
+            if segment_plans:
+                segment_keys = [unit for unit, unit_indices in units.items() if not unit_indices]
+                for cache in self._caches():
+                    if not segment_keys:
+                        break
+                    cached = cache.get_many(source_lang, target_lang, segment_keys)
+                    self._backfill_incremental(cache, source_lang, target_lang, cached)
+                    translated.update(cached)
+                    for segment in cached:
+                        del units[segment]
+                    segment_keys = [key for key in segment_keys if key not in cached]
+            for pack in self.pack_texts(list(units)):
+                tasks.append((source_lang, target_lang, pack, [units[text] for text in pack]))
+        
+        logger.debug("[批量] 需要发送 %d 个请求", len(tasks))
+        if tasks:
+            # 线程池在批次之间复用，每个线程的客户端和长连接不会随批次结束而丢弃
+            pool = self.executor()
+            futures = [pool.submit(self._translate_pack, pack, source_lang, target_lang)
+                       for source_lang, target_lang, pack, _ in tasks]
+            for future, (source_lang, target_lang, pack, index_lists) in zip(futures, tasks):
+                # 检查取消标志，取消尚未开始的请求
                 if self.cancel_flag:
-                    print("[翻译] 检测到取消标志，停止重试")
-                    return text
-                time.sleep(delay)
-                delay = min(self.max_delay, delay * 2)
+                    logger.info("[批量] 检测到取消标志，停止批量翻译")
+                    for pending_future in futures:
+                        pending_future.cancel()
+                    break
+                    
+                try:
+                    translated = future.result()
+                except Exception as e:
+                    logger.warning("[批量] 出错: %s", e)
+                    translated = [None] * len(pack)
+                
+                succeeded = {}
+                for text, translation, indices in zip(pack, translated, index_lists):
+                    if translation is not None:
+                        succeeded[text] = translation
+                    elif indices and not self.cancel_flag:
+                        self.failed_count += 1
+                    for idx in indices:
+                        results[idx] = text if translation is None else translation
+                        done[idx] = translation is not None or not self.cancel_flag
+                if succeeded:
+                    unit_translations[(source_lang, target_lang)].update(succeeded)
+                    for cache in self._caches():
+                        cache.put_many(source_lang, target_lang, succeeded)
+            if self.cancel_flag:
+                # 与原先 with 语句退出时一样，等待已经开始的请求结束
+                for pending_future in futures:
+                    if not pending_future.cancelled():
+                        try:
+                            pending_future.result()
+                        except Exception:
+                            pass
         
-        return text
+        # 拼接分段翻译的超长文本，任何一段失败时保留原文
+        for source_lang, target_lang, text, indices, segments in segment_plans:
+            translated = unit_translations[(source_lang, target_lang)]
+            pieces = [translated.get(segment) for segment, _ in segments]
+            if None in pieces:
+                result = text
+                if not self.cancel_flag:
+                    self.failed_count += 1
+            else:
+                result = self.join_segments(segments, pieces, target_lang)
+                self.metrics.incr('segmented_texts')
+                for cache in self._caches():
+                    cache.put_many(source_lang, target_lang, {text: result})
+            for idx in indices:
+                results[idx] = result
+                done[idx] = None not in pieces or not self.cancel_flag
+        
+        # 取消时只返回连续完成的部分
+        if self.cancel_flag and not all(done):
+            return results[:done.index(False)]
+        return results
 
-    def translate_batch(self, texts):
-        """批量翻译文本"""
-        if not texts:
-            return []
-            
+    @staticmethod
+    def build_output_frame(df, lookup, translate_columns=None, omit_skipped=False):
+        """一次性构建输出表：每个原始列后面紧跟对应的 _EN 列
+
+        lookup 为 {原文: 译文} 的 Series；不在其中的值原样保留，非文本列直接复制。
+        分类类型的列只映射类别表，_EN 列由原编码数组换算得到，不逐行处理。
+        translate_columns 为需要翻译的列（None 表示全部），其余列的 _EN 列为原样副本，omit_skipped 时不输出
+        """
+        columns = []
+        for column in df.columns:
+            source = df[column]
+            skipped = translate_columns is not None and column not in translate_columns
+            if skipped and omit_skipped:
+                columns.append(source)
+                continue
+            if skipped or not len(lookup) or not is_text_column(source):
+                translated = source.copy()
+            elif isinstance(source.dtype, pd.CategoricalDtype):
+                translated = ExcelTranslator.translate_categorical(source, lookup)
+            else:
+                mapped = source.map(lookup)
+                translated = mapped.where(mapped.notna(), source)
+            columns.append(source)
+            columns.append(translated.rename(f"{column}_EN"))
+        if not columns:
+            return df.copy()
+        return pd.concat(columns, axis=1)
+
+    @staticmethod
+    def translate_categorical(source, lookup):
+        """翻译分类列：映射类别表后合并相同的译文，再用编码数组一次换算出新编码"""
+        categories = source.cat.categories
+        mapped = categories.map(lookup)
+        translated = np.where(mapped.isna(), categories, mapped)
+        # 不同原文可能得到相同的译文，类别必须唯一
+        remap, new_categories = pd.factorize(translated)
+        codes = source.cat.codes.to_numpy()
+        new_codes = np.where(codes >= 0, remap[codes], -1)
+        return pd.Series(pd.Categorical.from_codes(new_codes, new_categories),
+                         index=source.index, name=source.name)
+
+    @staticmethod
+    def is_translatable(value):
+        """判断单元格值是否需要送去翻译（非空字符串）"""
+        return isinstance(value, str) and bool(value.strip())
+
+    @staticmethod
+    def format_eta(estimated_seconds):
+        """格式化预计剩余时间"""
+        if estimated_seconds < 60:
+            return f"{int(estimated_seconds)}秒"
+        elif estimated_seconds < 3600:
+            return f"{int(estimated_seconds/60)}分钟"
+        hours = int(estimated_seconds/3600)
+        minutes = int((estimated_seconds % 3600)/60)
+        return f"{hours}小时{minutes}分钟"
+
+    def parse_sheets(self, excel_file, input_file):
+        """逐个解析工作表，生成 (工作表名, DataFrame, {列名: 可翻译的唯一值列表}, {列名: 列画像})
+
+        process_workers 大于 1 且有多个工作表时，在进程池中并行解析，
+        充分利用多核；翻译请求仍在当前进程中统一发送
+        """
+        sheet_names = excel_file.sheet_names
+        if self.process_workers > 1 and len(sheet_names) > 1:
+            workers = min(self.process_workers, len(sheet_names))
+            logger.info("[并行] 使用 %d 个进程解析 %d 个工作表", workers, len(sheet_names))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_parse_sheet_worker, input_file, sheet_name, self.profiler,
+                                       self.translation_mode, self.categorical, self.header_only)
+                           for sheet_name in sheet_names]
+                for sheet_name, future in zip(sheet_names, futures):
+                    if self.cancel_flag:
+                        for pending in futures:
+                            pending.cancel()
+                        return
+                    with self.metrics.stage('read'):
+                        df, column_values, profile = future.result()
+                    yield sheet_name, df, column_values, profile
+        else:
+            for sheet_name in sheet_names:
+                if self.cancel_flag:
+                    return
+                with self.metrics.stage('read'):
+                    df = excel_file.parse(sheet_name)
+                with self.metrics.stage('profile'):
+                    df, column_values, profile = prepare_sheet(df, self.profiler, self.translation_mode,
+                                                               self.categorical, self.header_only)
+                yield sheet_name, df, column_values, profile
+
+    def plan_translations(self, excel_file, input_file, progress_callback=None):
+        """规划阶段：解析每个工作表（只解析一次），收集所有列中需要翻译的值，得到全局唯一集合
+
+        返回 (全局唯一值列表, 按列去重时需要的翻译次数, {工作表名: DataFrame})，
+        解析结果保留下来供写出阶段直接使用，避免重复解析
+        """
+        unique_values = {}  # 使用 dict 保持首次出现的顺序
+        per_column_total = 0
+        frames = {}
+
+        self.skip_report = {}
+        self.column_report = {}
+        for sheet_name, df, column_values, profile in self.parse_sheets(excel_file, input_file):
+            frames[sheet_name] = df
+            self.record_profile(sheet_name, profile)
+            if self.header_only:
+                column_values = {'(表头)': self.header_values(df.columns)}
+            for column, values in column_values.items():
+                # 过滤掉数字、编号、邮箱、网址、日期等不需要翻译的值，按单元格数统计
+                with self.metrics.stage('filter'):
+                    if column in df.columns and not self.header_only:
+                        occurrences = df[column].value_counts(sort=False).to_dict()
+                        cells = [occurrences.get(value, 0) for value in values]
+                    else:
+                        cells = [1] * len(values)
+                    kept, skipped = self.skip_filter.apply(values, self.translation_mode, cells)
+                self.record_skips(sheet_name, column, sum(cells), skipped)
+                per_column_total += len(kept)
+                for value in kept:
+                    unique_values[value] = None
+
+        return list(unique_values), per_column_total, frames
+
+    def record_profile(self, sheet_name, profile):
+        """记录一个工作表的列画像，统计跳过的整列"""
+        report = self.column_report.setdefault(sheet_name, {})
+        for column, info in profile.items():
+            report[str(column)] = info
+        skipped = [str(column) for column, info in profile.items() if not info['translate']]
+        self.metrics.incr('columns_profiled', len(profile))
+        self.metrics.incr('columns_skipped', len(skipped))
+        if skipped:
+            logger.info("[列画像] %s: 跳过 %d/%d 列 %s", sheet_name, len(skipped), len(profile),
+                        ", ".join(f"{column}({report[column]['kind']})" for column in skipped))
+
+    @staticmethod
+    def header_values(columns):
+        """表头中需要翻译的列名（pandas 为空列名生成的 Unnamed: i 除外）"""
+        return [str(column) for column in dict.fromkeys(columns)
+                if ExcelTranslator.is_translatable(column)
+                and not re.fullmatch(r'Unnamed: \d+(?:\.\d+)?', str(column))]
+
+    def translated_columns(self, sheet_name, columns):
+        """按列画像返回需要生成译文的列；只翻译表头时为空"""
+        if self.header_only:
+            return set()
+        report = self.column_report.get(sheet_name, {})
+        return {column for column in columns if report.get(str(column), {'translate': True})['translate']}
+
+    def record_skips(self, sheet_name, column, cells, skipped):
+        """累计一列的跳过统计：cells 为该列中待过滤的单元格数，skipped 为 {规则名: 跳过的单元格数}"""
+        report = self.skip_report.setdefault(sheet_name, {}).setdefault(
+            str(column), {'cells': 0, 'skipped': 0, 'rules': {}})
+        report['cells'] += cells
+        for rule, count in skipped.items():
+            report['skipped'] += count
+            report['rules'][rule] = report['rules'].get(rule, 0) + count
+        self.metrics.incr('cells_skipped', sum(skipped.values()))
+        if skipped:
+            logger.debug("[过滤] %s - %s: 跳过 %d/%d 个单元格 %s", sheet_name, column, sum(skipped.values()), cells, skipped)
+
+    def translate_values(self, values, progress_callback=None):
+        """对全局唯一值集合进行翻译，每个值只翻译一次，返回 {原文: 译文}"""
+        translations = {}
+        total_all_values = len(values)
+        if total_all_values == 0:
+            return translations
+
+        progress_callback = ProgressReporter.wrap(progress_callback, self.progress_interval)
+        start_time = time.time()
+        processed_values = 0
+        # 一次性对所有唯一值做向量化语言分类
+        with self.metrics.stage('detect'):
+            languages = self.resolve_languages_many(values)
+
+        def status():
+            # 只在真正刷新界面时才格式化状态和计算预计剩余时间
+            elapsed = time.time() - start_time
+            if processed_values > 0 and elapsed > 0:
+                time_str = self.format_eta((total_all_values - processed_values) * elapsed / processed_values)
+            else:
+                time_str = "计算中..."
+            percent = int((processed_values / total_all_values) * 100)
+            return (f"正在翻译: 全部工作表的唯一值\n"
+                    f"处理进度: 第{processed_values + 1}-{batch_end}条(共{total_all_values}条唯一值)\n"
+                    f"总体进度: {processed_values}/{total_all_values}条唯一值 | 完成{percent}% | 预计剩余: {time_str}")
+
+        step = self.batch_step()
+        for i in range(0, total_all_values, step):
+            if self.cancel_flag:
+                logger.info("[处理] 检测到取消标志，停止翻译")
+                break
+
+            batch_list = values[i:i+step]
+            batch_end = min(i + step, total_all_values)
+            if progress_callback:
+                progress_callback(processed_values * 100 // total_all_values, status)
+
+            with self.metrics.stage('translate'):
+                batch_results = self.translate_batch(batch_list, languages[i:i+step])
+            translations.update(zip(batch_list, batch_results))
+            processed_values += len(batch_results)
+
+        if progress_callback:
+            progress_callback(processed_values * 100 // total_all_values, status, force=True)
+        return translations
+
+    @staticmethod
+    def stream_headers(header_row):
+        """按 pandas 的规则生成列名：空列名为 Unnamed: i，重复列名追加 .1、.2"""
+        headers = []
+        seen = {}
+        for i, name in enumerate(header_row):
+            if name is None or (isinstance(name, str) and not name.strip()):
+                name = f"Unnamed: {i}"
+            if name in seen:
+                seen[name] += 1
+                new_name = f"{name}.{seen[name]}"
+                while new_name in seen:
+                    seen[name] += 1
+                    new_name = f"{name}.{seen[name]}"
+                seen[new_name] = 0
+                name = new_name
+            else:
+                seen[name] = 0
+            headers.append(name)
+        return headers
+
+    def _plan_stream_sheet(self, sheet_name, headers, rows):
+        """流式模式：用工作表的第一块数据做列画像
+
+        返回每列的输出方式：True 翻译，False 输出原样副本，None 不输出 _EN 列
+        """
+        with self.metrics.stage('profile'):
+            frame = pd.DataFrame.from_records(rows, columns=headers) if rows else pd.DataFrame(columns=headers)
+            profile = self.profiler.profile(frame, self.translation_mode)
+        self.record_profile(sheet_name, profile)
+        if self.header_only:
+            return [None] * len(headers)
+        return [True if profile[column]['translate'] else (None if self.omit_skipped_columns else False)
+                for column in headers]
+
+    def _stream_output_header(self, sheet_name, headers, flags):
+        """流式模式的输出表头；只翻译表头时直接翻译列名"""
+        if not self.header_only:
+            return [name for column, flag in zip(headers, flags)
+                    for name in ((column,) if flag is None else (column, f"{column}_EN"))]
+        names = self.header_values(headers)
+        with self.metrics.stage('filter'):
+            kept, skipped = self.skip_filter.apply(names, self.translation_mode)
+        self.record_skips(sheet_name, '(表头)', len(names), skipped)
+        with self.metrics.stage('detect'):
+            languages = self.resolve_languages_many(kept)
+        with self.metrics.stage('translate'):
+            translated = dict(zip(kept, self.translate_batch(kept, languages)))
+        return [translated.get(str(column), column) for column in headers]
+
+    @staticmethod
+    def _stream_output_row(values, flags, cache):
+        """按每列的输出方式展开一行：原值后跟译文、原样副本或不加 _EN 列"""
+        row = []
+        for value, flag in zip(values, flags):
+            row.append(value)
+            if flag:
+                row.append(cache.get(value, value) if isinstance(value, str) else value)
+            elif flag is not None:
+                row.append(value)
+        return row
+
+    def _stream_column_gained_cjk(self, sheet_name, column, rows, col_idx):
+        """流式模式：按第一块数据跳过的列在后续数据块中出现含中文的值时，该列改为翻译
+
+        只检查由列画像跳过（而不是按列名排除）的列；en2zh 模式不翻译中文，不需要检查
+        """
+        info = self.column_report.get(sheet_name, {}).get(str(column))
+        if self.translation_mode == 'en2zh' or info is None or info['kind'] == 'excluded':
+            return False
+        if not any(isinstance(row[col_idx], str) and re.search(CJK_PATTERN, row[col_idx]) for row in rows):
+            return False
+        logger.info("[列画像] %s - %s: 后续数据中出现中文，改为翻译该列", sheet_name, column)
+        self.column_report[sheet_name][str(column)] = {'kind': 'mixed', 'translate': True}
+        self.metrics.incr('columns_skipped', -1)
+        return True
+
+    def _translate_stream_chunk(self, rows, cache, sheet_name, headers, flags):
+        """翻译一个数据块中需要翻译的列里尚未翻译过的唯一值，结果写入 cache"""
+        pending = {}
+        for col_idx, column in enumerate(headers):
+            if flags[col_idx] is False and self._stream_column_gained_cjk(sheet_name, column, rows, col_idx):
+                flags[col_idx] = True
+            if not flags[col_idx]:
+                continue
+            occurrences = {}  # 本块中每个值出现的单元格数
+            for row in rows:
+                value = row[col_idx]
+                if self.is_translatable(value):
+                    occurrences[value] = occurrences.get(value, 0) + 1
+            # 按单元格统计跳过数量；跳过的值直接作为自身的译文放入缓存
+            with self.metrics.stage('filter'):
+                kept, skipped = self.skip_filter.apply(occurrences, self.translation_mode, occurrences.values())
+            self.record_skips(sheet_name, column, sum(occurrences.values()), skipped)
+            kept_set = set(kept)
+            for value in occurrences:
+                if value in cache or value in pending:
+                    continue
+                if value in kept_set:
+                    pending[value] = None
+                else:
+                    cache[value] = value
+        values = list(pending)
+        with self.metrics.stage('detect'):
+            languages = self.resolve_languages_many(values)
+        step = self.batch_step()
+        for i in range(0, len(values), step):
+            if self.cancel_flag:
+                return
+            batch_list = values[i:i+step]
+            with self.metrics.stage('translate'):
+                cache.update(zip(batch_list, self.translate_batch(batch_list, languages[i:i+step])))
+
+    def process_excel_streaming(self, input_file, output_file, progress_callback=None):
+        """流式处理大文件：openpyxl 只读模式逐行读取、只写模式逐行写出
+
+        按 stream_chunk_rows 行为一块翻译并写出，内存占用与文件大小无关；
+        输出布局与 process_excel 相同（每个原始列后面紧跟对应的 _EN 列）
+        """
+        progress_callback = ProgressReporter.wrap(progress_callback, self.progress_interval)
         try:
-            text_list = texts.tolist() if hasattr(texts, 'tolist') else list(texts)
-            results = []
+            logger.info("=== 开始流式处理Excel文件 ===")
+            with self.metrics.stage('read'):
+                source_wb = openpyxl.load_workbook(input_file, read_only=True, data_only=True)
+            output_wb = openpyxl.Workbook(write_only=True)
+            total_sheets = len(source_wb.sheetnames)
+            logger.info("共发现 %d 个工作表", total_sheets)
+            
+            sidecars = SidecarWriter(output_file, self.sidecars) if self.sidecars else None
+            if sidecars and 'parquet' in sidecars.formats:
+                logger.warning("流式模式不输出 Parquet（需要整表数据）")
+            # 本次运行内的译文缓存，超出上限时清空（跨块复用由翻译记忆库负责）
+            cache = {}
+            self.skip_report = {}
+            self.column_report = {}
+            rows_done = 0
             
-            print(f"\n[批量] 开始处理 {len(text_list)} 个文本")
-            for idx, text in enumerate(text_list):
-                # 检查取消标志
+            for sheet_idx, sheet_name in enumerate(source_wb.sheetnames):
                 if self.cancel_flag:
-                    print("[批量] 检测到取消标志，停止批量翻译")
-                    return results
+                    logger.info("[处理] 检测到取消标志，停止处理工作表")
+                    return False
                     
-                print(f"[批量] 处理第 {idx+1}/{len(text_list)} 个文本")
-                result = self.translate_text(text)
-                results.append(result)
+                worksheet = source_wb[sheet_name]
+                output_ws = output_wb.create_sheet(title=sheet_name)
+                total_rows = worksheet.max_row or 0
+                logger.info("[流式] 开始处理工作表 %d/%d: %s", sheet_idx + 1, total_sheets, sheet_name)
+                
+                row_iter = worksheet.iter_rows(values_only=True)
+                header_row = next(row_iter, None)
+                if header_row is None:
+                    continue
+                headers = self.stream_headers(header_row)
+                width = len(headers)
+                flags = None  # 每列的输出方式，读完第一块数据后由列画像确定
                 
-            return results
+                chunk = []
+                sheet_rows = 0
+                # 逐行读取与翻译、写出交替进行，读取耗时按块累计
+                read_start = time.perf_counter()
+                for row in itertools.chain(row_iter, [None]):
+                    if row is not None:
+                        # 补齐或截断到表头宽度
+                        row = tuple(row[:width]) + (None,) * (width - len(row))
+                        chunk.append(row)
+                        if len(chunk) < self.stream_chunk_rows:
+                            continue
+                    self.metrics.add_time('read', time.perf_counter() - read_start)
+                    if flags is None:
+                        flags = self._plan_stream_sheet(sheet_name, headers, chunk)
+                        output_header = self._stream_output_header(sheet_name, headers, flags)
+                        output_ws.append(output_header)
+                        if sidecars:
+                            sidecars.start_sheet(sheet_name, output_header)
+                    if not chunk:
+                        break
+                        
+                    if len(cache) > self.stream_cache_size:
+                        cache.clear()
+                    self._translate_stream_chunk(chunk, cache, sheet_name, headers, flags)
+                    if self.cancel_flag:
+                        logger.info("[处理] 检测到取消标志，停止处理")
+                        return False
+                        
+                    with self.metrics.stage('write'):
+                        output_rows = [self._stream_output_row(values, flags, cache) for values in chunk]
+                        for output_row in output_rows:
+                            output_ws.append(output_row)
+                    if sidecars:
+                        with self.metrics.stage('sidecar'):
+                            sidecars.write_rows(output_rows)
+                            sidecars.write_pairs((value, cache[value]) for values in chunk for value in values
+                                                 if isinstance(value, str) and value in cache)
+                    sheet_rows += len(chunk)
+                    rows_done += len(chunk)
+                    chunk = []
+                    
+                    if progress_callback:
+                        sheet_progress = sheet_rows / max(total_rows - 1, 1)
+                        total_progress = (sheet_idx + min(sheet_progress, 1)) / total_sheets * 100
+                        progress_callback(total_progress, functools.partial(
+                            "正在流式处理: {}\n已处理 {}/{} 行 | 累计 {} 行".format,
+                            sheet_name, sheet_rows, max(total_rows - 1, sheet_rows), rows_done))
+                    read_start = time.perf_counter()
+                        
+                logger.info("[流式] 工作表 %s 完成，共 %d 行", sheet_name, sheet_rows)
+            
+            logger.info("保存文件...")
+            with self.metrics.stage('write'):
+                output_wb.save(output_file)
+            source_wb.close()
+            logger.info("文件已保存至: %s", output_file)
+            if sidecars:
+                sidecars.close()
+                logger.info("旁路输出: %s", ", ".join(sidecars.paths))
+            if self.memory:
+                stats = self.memory.stats()
+                logger.info("翻译记忆库: %d 条, 命中 %d 次, 未命中 %d 次", stats['entries'], stats['hits'], stats['misses'])
+            return True
             
         except Exception as e:
-            print(f"[批量] 出错: {str(e)}")
-            return [self.translate_text(text) for text in text_list]
+            logger.exception("处理出错")
+            if progress_callback:
+                progress_callback(0, f"处理出错: {str(e)}", force=True)
+            return False
 
     def process_excel(self, input_file, output_file, progress_callback=None):
-        """处理Excel文件"""
+        """处理Excel文件
+
+        启用 resume 时，已完成的翻译逐步写入输出文件旁的任务日志（.journal），
+        取消、崩溃或网络失败后再次运行不再重复发送已完成的翻译；全部成功后删除日志
+        """
+        self.failed_count = 0
+        self.journal = None
+        with self._pack_lock:
+            # 打包在上一个文件中被关闭时，新任务重新尝试
+            self._pack_failures = 0
+            self._pack_disabled = False
+        self.metrics.reset()
+        if self.glossary is not None:
+            self.glossary.reset_stats()
+        run_start = time.perf_counter()
+        success = False
+        # 合并高频进度更新，按固定频率回调
+        progress_callback = ProgressReporter.wrap(progress_callback, self.progress_interval)
         try:
-            print("\n=== 开始处理Excel文件 ===")
-            
-            # 添加时间跟踪变量
-            start_time = time.time()
-            last_update_time = start_time
-            last_processed_values = 0
-            processing_speed = 0  # 每秒处理的条目数
+            if self.resume:
+                self.journal = JobJournal(f"{output_file}.journal", input_file, self.translation_mode)
+                if self.journal.resumed:
+                    logger.info("[恢复] 从任务日志恢复 %d 条译文", len(self.journal.translations))
+                    if progress_callback:
+                        progress_callback(0, f"继续上次未完成的任务，已有 {len(self.journal.translations)} 条译文")
+            if self.incremental or self.previous_path:
+                # 必须在覆盖输出文件之前读取上一次的输出
+                self.incremental_index = self.load_incremental(output_file)
+            success = self._process_workbook(input_file, output_file, progress_callback)
+            if success and self.incremental_index is not None:
+                self.incremental_index.save_manifest(self.manifest_path(output_file))
+                logger.info("[增量] 复用 %d 条上一次的译文，清单已保存", self.incremental_index.hits)
+            return success
+        finally:
+            self.shutdown_executor()
+            if progress_callback:
+                progress_callback.flush()
+            if self.journal:
+                # 有失败或被取消时保留日志，下次运行只需处理剩余部分
+                finished = success and self.failed_count == 0
+                self.journal.close(remove=finished)
+                if not finished:
+                    logger.warning("[恢复] 进度已保存到 %s，再次运行将从中断处继续", self.journal.path)
+                self.journal = None
+            self.incremental_index = None
+            self.metrics.add_time('total', time.perf_counter() - run_start)
+            self.log_metrics()
+            if self.metrics_path:
+                self.metrics.dump(self.metrics_path)
+
+    def log_metrics(self):
+        """把本次运行的关键指标写入日志"""
+        snapshot = self.metrics.snapshot()
+        counters = snapshot['counters']
+        latency = snapshot['latency']
+        logger.info("[指标] 阶段耗时: %s", ", ".join(f"{name} {seconds:.2f}s" for name, seconds in snapshot['stages'].items()))
+        logger.info("[指标] 请求 %d 次, 重试 %d 次, 限流 %d 次, 失败 %d 次, 缓存命中 %d/%d, 发送 %d 字节",
+                    counters['requests'], counters['retries'], counters['throttled'], counters['failures'],
+                    counters['cache_hits'], counters['cache_hits'] + counters['cache_misses'], counters['bytes_sent'])
+        if latency['count']:
+            logger.info("[指标] 请求延迟 p50 %.3fs, p95 %.3fs, p99 %.3fs",
+                        latency['p50'], latency['p95'], latency['p99'])
+            logger.info("[指标] 当前速率 %.1f/秒 (上限 %.1f/秒), 熔断 %d 次",
+                        self.rate_limiter.rate, self.rate_limiter.max_rate, counters.get('circuit_opened', 0))
+        if self.glossary is not None:
+            stats = self.glossary.stats(top=5)
+            logger.info("[术语] 共 %d 条, 整格命中 %d 次, 含术语的文本 %d 条 (术语命中 %d 次)%s",
+                        stats['terms'], stats['exact_hits'], stats['embedded_texts'], stats['term_hits'],
+                        "".join(f", {item['term']} x{item['hits']}" for item in stats['top_terms']))
+
+    def _process_workbook(self, input_file, output_file, progress_callback=None):
+        """处理Excel文件（使用 pandas 或流式模式）"""
+        progress_callback = ProgressReporter.wrap(progress_callback, self.progress_interval)
+        try:
+            logger.info("=== 开始处理Excel文件 ===")
             
             # 检查文件大小
             file_size = os.path.getsize(input_file)
             if progress_callback:
                 progress_callback(0, f"文件大小: {file_size/1024/1024:.1f}MB")
             
-            if file_size > 10 * 1024 * 1024:  # 大于10MB
-                if not messagebox.askyesno("警告", 
-                    f"文件大小为 {file_size/1024/1024:.1f}MB，处理可能需要较长时间。\n是否继续？"):
-                    return False
-                    
-            print(f"开始读取Excel文件: {input_file}")
-            excel_file = pd.ExcelFile(input_file)
+            # 大文件（或显式开启时）使用流式模式，内存占用保持平稳；.xls 格式不支持流式读取
+            is_xlsx = input_file.lower().endswith(('.xlsx', '.xlsm'))
+            if is_xlsx and (self.streaming or file_size > self.streaming_threshold):
+                logger.info("文件大小 %.1fMB，使用流式模式处理", file_size / 1024 / 1024)
+                return self.process_excel_streaming(input_file, output_file, progress_callback)
+            
+            logger.info("开始读取Excel文件: %s", input_file)
+            with self.metrics.stage('read'):
+                excel_file = pd.ExcelFile(input_file)
+            total_sheets = len(excel_file.sheet_names)
+            logger.info("共发现 %d 个工作表", total_sheets)
             
+            # 规划阶段：跨所有工作表和列收集唯一值，每个值只翻译一次
+            if progress_callback:
+                progress_callback(0, "正在扫描所有工作表...")
+            unique_values, per_column_total, frames = self.plan_translations(excel_file, input_file)
+            self.dedup_report = {
+                'per_column_calls': per_column_total,
+                'unique_values': len(unique_values),
+                'saved_calls': per_column_total - len(unique_values)
+            }
+            logger.info("按列去重需翻译 %d 次，全局去重后只需 %d 次，节省 %d 次翻译调用",
+                        per_column_total, len(unique_values), self.dedup_report['saved_calls'])
+            
+            # 翻译和写出两个阶段依次占用总进度的前后两段，进度单调递增
+            translate_end = self.translate_progress_share
+            translations = self.translate_values(
+                unique_values, progress_callback.phase(0, translate_end) if progress_callback else None)
+            if self.cancel_flag:
+                logger.info("[处理] 检测到取消标志，停止处理")
+                return False
+            
+            # 译文查找表只构建一次，各列用哈希索引向量化映射
+            lookup = pd.Series(translations, dtype=object)
+            sidecars = SidecarWriter(output_file, self.sidecars) if self.sidecars else None
+            if sidecars:
+                sidecars.write_pairs(translations.items())
             # 使用 with 语句来确保正确关闭文件
-            with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-                total_sheets = len(excel_file.sheet_names)
-                print(f"共发现 {total_sheets} 个工作表")
-                
-                # 计算总的唯一值数量
-                total_all_values = 0
-                processed_values = 0
-                sheet_values_map = {}
-                
-                # 预扫描所有工作表的唯一值数量
-                for sheet_name in excel_file.sheet_names:
-                    df = pd.read_excel(input_file, sheet_name=sheet_name)
-                    sheet_values = 0
-                    for column in df.columns:
-                        unique_count = len(df[column].dropna().unique())
-                        sheet_values += unique_count
-                    sheet_values_map[sheet_name] = sheet_values
-                    total_all_values += sheet_values
-                
-                # 处理每个工作表
+            with self.open_output(output_file) as writer:
+                # 处理每个工作表：把翻译结果映射回每个 _EN 列
                 for sheet_idx, sheet_name in enumerate(excel_file.sheet_names):
                     if self.cancel_flag:
-                        print("\n[处理] 检测到取消标志，停止处理工作表")
+                        logger.info("[处理] 检测到取消标志，停止处理工作表")
                         return False
                         
-                    print(f"\n[DEBUG] 开始处理工作表 {sheet_idx + 1}/{total_sheets}: {sheet_name}")
+                    logger.debug("开始处理工作表 %d/%d: %s", sheet_idx + 1, total_sheets, sheet_name)
                     
-                    df = pd.read_excel(input_file, sheet_name=sheet_name)
-                    print(f"[DEBUG] 成功读取工作表，列数: {len(df.columns)}")
-                    
-                    total_cells = len(df.columns) * len(df)
-                    cells_processed = 0
-                    
-                    print(f"工作表大小: {len(df)} 行 x {len(df.columns)} 列")
+                    # 直接使用规划阶段的解析结果，写出后释放
+                    df = frames.pop(sheet_name)
+                    logger.debug("工作表大小: %d 行 x %d 列", len(df), len(df.columns))
                     
                     if progress_callback:
-                        sheet_progress = (sheet_idx / total_sheets) * 100
-                        progress_callback(sheet_progress, f"正在处理工作表: {sheet_name}")
+                        sheet_progress = translate_end + (100 - translate_end) * sheet_idx / total_sheets
+                        progress_callback(sheet_progress, f"正在写入工作表: {sheet_name}", force=True)
                     
-                    for column_idx, column in enumerate(df.columns):
-                        if self.cancel_flag:
-                            print("\n[处理] 检测到取消标志，停止处理列")
-                            return False
-                            
-                        print(f"\n[DEBUG] 开始处理第 {column_idx + 1}/{len(df.columns)} 列: {column}")
-                        
-                        if progress_callback:
-                            column_progress = (cells_processed / total_cells) * 100
-                            total_progress = (sheet_progress + column_progress) / 2
-                            status_line1 = f"正在翻译: {sheet_name} - {column}"
-                            progress_callback(total_progress, status_line1)
-                        
-                        # 尝试批量翻译
-                        values = df[column].dropna().unique()
-                        total_unique = len(values)
-                        print(f"该列共有 {total_unique} 个唯一值需要翻译")
-                        
-                        if total_unique > 0:
-                            # 分批处理
-                            translations = {}
-                            for i in range(0, total_unique, self.batch_size):
-                                batch = values[i:i+self.batch_size]
-                                batch_list = batch.tolist() if hasattr(batch, 'tolist') else list(batch)
-                                
-                                # 更新处理进度信息
-                                if progress_callback:
-                                    batch_end = min(i + self.batch_size, total_unique)
-                                    # 第二行显示批次进度
-                                    status_line2 = f"处理进度: 第{i+1}-{batch_end}条(共{total_unique}条唯一值) | 完成{int((i/total_unique)*100)}%"
-                                    
-                                    # 更新处理速度和预计剩余时间
-                                    current_time = time.time()
-                                    time_elapsed = current_time - last_update_time
-                                    if time_elapsed >= 1:  # 每秒更新一次速度
-                                        values_processed = processed_values - last_processed_values
-                                        processing_speed = values_processed / time_elapsed
-                                        last_update_time = current_time
-                                        last_processed_values = processed_values
-                                    
-                                    # 计算预计剩余时间
-                                    if processing_speed > 0:
-                                        remaining_values = total_all_values - processed_values
-                                        estimated_seconds = remaining_values / processing_speed
-                                        if estimated_seconds < 60:
-                                            time_str = f"{int(estimated_seconds)}秒"
-                                        elif estimated_seconds < 3600:
-                                            time_str = f"{int(estimated_seconds/60)}分钟"
-                                        else:
-                                            hours = int(estimated_seconds/3600)
-                                            minutes = int((estimated_seconds % 3600)/60)
-                                            time_str = f"{hours}小时{minutes}分钟"
-                                    else:
-                                        time_str = "计算中..."
-                                    
-                                    # 第三行显示总体进度和预计剩余时间
-                                    processed_values += len(batch)
-                                    total_progress = int((processed_values / total_all_values) * 100)
-                                    status_line3 = f"总体进度: {processed_values}/{total_all_values}条唯一值 | 完成{total_progress}% | 预计剩余: {time_str}"
-                                    progress_callback(total_progress, f"{status_line1}\n{status_line2}\n{status_line3}")
-                                
-                                print(f"\n处理第 {i+1}-{batch_end} 个值")
-                                batch_results = self.translate_batch(batch_list)
-                                translations.update(dict(zip(batch_list, batch_results)))
-                            
-                            # 使用映射进行翻译
-                            en_column = f"{column}_EN"
-                            df[en_column] = df[column].map(lambda x: translations.get(x, x))
+                    with self.metrics.stage('assemble'):
+                        if self.header_only:
+                            df = df.set_axis([translations.get(str(column), column) for column in df.columns], axis=1)
                         else:
-                            print("该列没有需要翻译的有效值")
-                            en_column = f"{column}_EN"
-                            df[en_column] = df[column]
+                            df = self.build_output_frame(df, lookup, self.translated_columns(sheet_name, df.columns),
+                                                         self.omit_skipped_columns)
                         
-                        # 更新处理进度
-                        cells_processed += len(df)
-                        print(f"[DEBUG] {column} 处理完成")
-                        print(f"[DEBUG] DataFrame 列数: {len(df.columns)}")
-                        print(f"[DEBUG] 当前列: {list(df.columns)}")
-                        
-                        # 重新排序列
-                        try:
-                            cols = list(df.columns)
-                            idx = cols.index(column)
-                            print(f"[DEBUG] 当前列索引: {idx}")
-                            print(f"[DEBUG] 英文列名: {en_column}")
-                            cols.remove(en_column)
-                            cols.insert(idx + 1, en_column)
-                            print(f"[DEBUG] 重排后的列: {cols}")
-                            df = df[cols]
-                        except Exception as e:
-                            print(f"[DEBUG] 列重排序出错: {str(e)}")
-                        
-                    print(f"\n[DEBUG] 准备保存工作表: {sheet_name}")
-                    df.to_excel(writer, sheet_name=sheet_name, index=False)
-                    print(f"[DEBUG] 工作表 {sheet_name} 保存完成")
+                    with self.metrics.stage('write'):
+                        self.write_sheet(writer, df, sheet_name)
+                    if sidecars:
+                        with self.metrics.stage('sidecar'):
+                            sidecars.write_frame(df, sheet_name)
+                    logger.debug("工作表 %s 保存完成", sheet_name)
                 
-                print("\n保存文件...")
+                logger.info("保存文件...")
                 # 不需要显式调用 save() 方法，with 语句会自动处理
+                save_start = time.perf_counter()
                 
-            print(f"文件已保存至: {output_file}")
+            self.metrics.add_time('write', time.perf_counter() - save_start)
+            logger.info("文件已保存至: %s", output_file)
+            if progress_callback:
+                progress_callback(100, "文件已保存", force=True)
+            if sidecars:
+                sidecars.close()
+                logger.info("旁路输出: %s", ", ".join(sidecars.paths))
+            if self.memory:
+                stats = self.memory.stats()
+                logger.info("翻译记忆库: %d 条, 命中 %d 次, 未命中 %d 次", stats['entries'], stats['hits'], stats['misses'])
             return True
             
         except Exception as e:
+            logger.exception("处理出错")
             if progress_callback:
-                progress_callback(0, f"处理出错: {str(e)}")
+                progress_callback(0, f"处理出错: {str(e)}", force=True)
             return False
 
+def warm_up(translator=None):
+    """预热：导入较重的依赖、加载 langdetect 语言模型、创建一个翻译客户端
+
+    图形界面显示后在后台线程调用，用户开始处理文件时无需再等待导入；
+    返回 {步骤: 耗时（秒）}
+    """
+    timings = {}
+    for module in HEAVY_MODULES:
+        start = time.perf_counter()
+        module.load()
+        timings[module._name] = time.perf_counter() - start
+    # langdetect 第一次检测时才从磁盘加载全部语言模型
+    start = time.perf_counter()
+    try:
+        langdetect.detect('warm up')
+    except Exception:
+        pass
+    timings['langdetect.profiles'] = time.perf_counter() - start
+    if translator is not None:
+        # 客户端按线程缓存，这里只是提前完成客户端类的初始化（语言表、请求参数），不发送请求
+        start = time.perf_counter()
+        for backend in translator.backends:
+            if isinstance(backend, GoogleBackend):
+                backend.clients.get('auto', 'en')
+        timings['clients'] = time.perf_counter() - start
+    return timings
+
 class TranslatorGUI:
     """翻译工具GUI界面 - Apple风格"""
     
@@ -334,7 +2941,7 @@ class TranslatorGUI:
         # 添加文件路径变量
         self.file_path = tk.StringVar()
         
-        self.translator = ExcelTranslator()
+        self.translator = ExcelTranslator(memory_path=DEFAULT_MEMORY_PATH)
         self.setup_ui()
         self.bind_hover_effects()
         self.bind_shortcuts()
@@ -345,8 +2952,9 @@ class TranslatorGUI:
         # 添加取消标志
         self.cancel_translation = False
         
-        # 添加消息队列用于线程间通信
-        self.message_queue = Queue()
+        # 翻译线程只写入最新进度状态，界面定时读取并渲染
+        self.latest_state = None
+        self.state_lock = threading.Lock()
         # 添加翻译状态标志
         self.is_translating = False
         
@@ -356,9 +2964,9 @@ class TranslatorGUI:
         self.window.configure(bg='#F5F5F7')  # Apple 经典的浅灰色景
         
         # 创建自定义字体
-        self.default_font = Font(family='Microsoft YaHei', size=9)
-        self.title_font = Font(family='Microsoft YaHei', size=16, weight='bold')  # 增大标题字号
-        self.subtitle_font = Font(family='Microsoft YaHei', size=9)  # 副标题字体
+        self.default_font = tkfont.Font(family='Microsoft YaHei', size=9)
+        self.title_font = tkfont.Font(family='Microsoft YaHei', size=16, weight='bold')  # 增大标题字号
+        self.subtitle_font = tkfont.Font(family='Microsoft YaHei', size=9)  # 副标题字体
         
         # 配置进度条样式
         self.style = ttk.Style()
@@ -576,25 +3184,21 @@ class TranslatorGUI:
         if not self.is_translating:
             return
             
-        while not self.message_queue.empty():
-            msg_type, data = self.message_queue.get()
-            if msg_type == 'progress':
-                progress, status = data
-                self.progress_bar['value'] = progress
-                self.status_label.config(text=status)
-            elif msg_type == 'log':
-                print(data)  # 在控制台显示日志
+        # 只渲染最新的状态，中间状态直接丢弃
+        with self.state_lock:
+            state, self.latest_state = self.latest_state, None
+        if state is not None:
+            progress, status = state
+            self.progress_bar['value'] = progress
+            self.status_label.config(text=status)
                 
-        # 每100ms检查一次消息队列
+        # 每100ms检查一次最新状态
         self.window.after(100, self.update_ui)
         
-    def queue_message(self, msg_type, data):
-        """消息添加到队列"""
-        self.message_queue.put((msg_type, data))
-        
     def translation_callback(self, progress, status):
-        """翻译进度回调"""
-        self.queue_message('progress', (progress, status))
+        """翻译进度回调（在翻译线程中调用）"""
+        with self.state_lock:
+            self.latest_state = (progress, status)
         
     def start_translation(self):
         """开始翻译流程"""
@@ -635,7 +3239,7 @@ class TranslatorGUI:
                 self.window.after(0, self.translation_completed, success)
                 
             except Exception as e:
-                self.queue_message('log', f"翻译出错: {str(e)}")
+                logger.exception("翻译出错: %s", e)
                 self.window.after(0, self.translation_completed, False)
             
         thread = threading.Thread(target=translation_thread)
@@ -662,23 +3266,19 @@ class TranslatorGUI:
             )
         elif self.cancel_translation:
             self.status_label.config(
-                text="翻译已取消",
+                text="翻译已取消，进度已保存，再次开始将从中断处继续",
                 fg='#FF3B30'  # Apple红色
             )
         
     def cancel_translation_task(self):
         """取消翻译任务"""
         if messagebox.askyesno("确认", "确定要取消翻译吗？"):
-            print("\n=== 开始取消翻译 ===")
-            print("1. 设置GUI取消标志")
+            logger.info("开始取消翻译")
             self.cancel_translation = True
             
-            print("2. 设置翻译器取消标志")
             self.translator.cancel_flag = True
             
-            print("3. 更新状态显示")
             self.status_label.config(text="正在取消...")
-            print("=== 取消流程初始化完成 ===\n")
         
     def bind_shortcuts(self):
         """绑定键盘快捷键"""
@@ -712,19 +3312,387 @@ class TranslatorGUI:
         try:
             self.window.iconbitmap('app.ico')
         except:
-            print("Warning: 图标文件未找到")
+            logger.warning("图标文件未找到")
         
         # 设置窗口最小尺寸
         self.window.minsize(600, 420)  # 同样更新最小尺寸
         # 居中显示
         self.window.eval('tk::PlaceWindow . center')
+        # 窗口显示后再在后台导入 pandas 等依赖
+        self.window.after(100, self.start_warm_up)
         # 运行
         self.window.mainloop()
 
-def main():
-    """主函数"""
+    def start_warm_up(self):
+        """在后台线程预热依赖，不阻塞界面"""
+        threading.Thread(target=self._warm_up, daemon=True).start()
+
+    def _warm_up(self):
+        start = time.perf_counter()
+        try:
+            timings = warm_up(self.translator)
+        except Exception:
+            logger.exception("[启动] 后台预热失败")
+            return
+        logger.info("[启动] 后台预热完成 %.2fs: %s", time.perf_counter() - start,
+                    ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+
+def collect_excel_files(paths):
+    """展开输入路径：文件直接使用，目录递归查找其中的Excel文件
+
+    跳过 Excel 的临时文件（~$ 开头）和已翻译的输出文件（_translated 结尾）
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    stem, ext = os.path.splitext(name)
+                    if (ext.lower() in EXCEL_EXTENSIONS and not name.startswith('~$')
+                            and not stem.endswith('_translated')):
+                        files.append(os.path.join(root, name))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            raise FileNotFoundError(f"找不到输入文件或目录: {path}")
+    return files
+
+def translated_output_path(input_file, output_dir=None, input_root=None):
+    """生成输出文件路径：原文件名_translated，.xls 输出为 .xlsx
+
+    指定 output_dir 时，按输入目录的相对结构放到输出目录下
+    """
+    name, ext = os.path.splitext(os.path.basename(input_file))
+    if ext.lower() == '.xls':
+        ext = '.xlsx'
+    file_dir = os.path.dirname(input_file)
+    if output_dir:
+        relative = os.path.relpath(file_dir, input_root) if input_root else ''
+        file_dir = os.path.normpath(os.path.join(output_dir, relative))
+    os.makedirs(file_dir or '.', exist_ok=True)
+    return os.path.join(file_dir, f"{name}_translated{ext}")
+
+def configure_logging(verbosity):
+    """按 -v 的次数开启日志：0 只显示警告，1 显示处理过程，2 及以上显示调试信息"""
+    level = {0: logging.WARNING, 1: logging.INFO}.get(verbosity, logging.DEBUG)
+    logging.basicConfig(level=level, stream=sys.stderr,
+                        format='%(asctime)s %(levelname)s %(processName)s %(message)s')
+    logger.setLevel(level)
+
+def build_arg_parser():
+    """命令行参数"""
+    parser = argparse.ArgumentParser(
+        prog='excel_translator',
+        description="Excel中英文翻译工具（命令行模式）。不带参数运行时启动图形界面。"
+    )
+    parser.add_argument('inputs', nargs='+', help="Excel文件或目录（递归处理目录下的所有工作簿）")
+    parser.add_argument('--mode', choices=['zh2en', 'en2zh', 'auto'], default='auto', help="翻译模式")
+    parser.add_argument('-o', '--output-dir', help="输出目录，默认与输入文件相同")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="同时处理的文件数（线程）")
+    parser.add_argument('-p', '--processes', type=int, default=1,
+                        help="进程数：多个文件时按文件分配到进程池，单个文件时并行解析工作表")
+    parser.add_argument('--workers', type=int, default=4, help="每个文件的并发翻译线程数")
+    parser.add_argument('--rate', type=float, default=5.0, help="全局每秒请求数上限（所有文件共享）")
+    parser.add_argument('--fixed-rate', action='store_true',
+                        help="固定按 --rate 发送，不根据限流信号自动调整速率（仍保留熔断）")
+    parser.add_argument('--memory', default=DEFAULT_MEMORY_PATH, help="翻译记忆库路径")
+    parser.add_argument('--no-memory', action='store_true', help="不使用翻译记忆库")
+    parser.add_argument('--backend', action='append', choices=BACKENDS,
+                        help="翻译后端，可多次指定组成后端链，按顺序尝试，被限流时自动切换到下一个"
+                             "（默认 google；glossary 为本地术语表，argos 为本地离线模型）")
+    parser.add_argument('--glossary',
+                        help="术语表文件（.csv 或 .jsonl）：与术语完全一致的单元格直接使用术语译文，不发送请求；"
+                             "文本中嵌入的术语在发送前处理，保证译法一致（也可作为 --backend glossary 使用）")
+    parser.add_argument('--glossary-mode', choices=GlossaryBackend.MODES, default='substitute',
+                        help="嵌入术语的处理方式：substitute 发送前直接替换为术语译文（默认），"
+                             "protect 替换为占位符、译后还原（占位符被改动时自动改用 substitute）")
+    parser.add_argument('--streaming', action='store_true', help="强制使用流式读写模式")
+    parser.add_argument('--categorical', action='store_true',
+                        help="重复度高的文本列以分类类型加载：只翻译类别表，_EN 列复用编码数组，内存和映射耗时更低")
+    parser.add_argument('--output-engine', choices=OUTPUT_ENGINES, default='openpyxl',
+                        help="Excel 输出引擎：openpyxl（默认）、write_only（逐行写出，内存占用低）、xlsxwriter（需要安装）")
+    parser.add_argument('--sidecar', action='append', default=[], choices=SidecarWriter.FORMATS,
+                        help="同时输出旁路格式（可多次指定）：csv、parquet（每个工作表一个文件）、jsonl（原文→译文对）")
+    parser.add_argument('--no-resume', action='store_true', help="不使用任务日志，总是从头开始")
+    parser.add_argument('--incremental', action='store_true',
+                        help="增量翻译：复用上一次输出（或输出文件旁的 .manifest.json 清单）中未变化的值，只翻译新增或修改的值")
+    parser.add_argument('--previous', metavar='PATH',
+                        help="指定上一次的翻译输出或清单（.json），隐含 --incremental，只能用于单个输入文件")
+    parser.add_argument('--skip-pattern', action='append', default=[], metavar='REGEX',
+                        help="自定义跳过规则，正则完整匹配单元格内容时不翻译（可多次指定）")
+    parser.add_argument('--keep-rule', action='append', default=[],
+                        choices=[name for name, _ in SkipFilter.BUILTIN_RULES] + ['target_language'],
+                        help="关闭某条内置跳过规则（可多次指定）")
+    parser.add_argument('--no-skip-filter', action='store_true', help="关闭跳过过滤器")
+    parser.add_argument('--columns', action='append', default=[], metavar='NAME',
+                        help="只翻译这些列（列名，支持 * ? 通配符，可多次指定）")
+    parser.add_argument('--exclude-columns', action='append', default=[], metavar='NAME',
+                        help="不翻译这些列（列名，支持 * ? 通配符，可多次指定）")
+    parser.add_argument('--header-only', action='store_true', help="只翻译表头（列名），单元格原样输出，不生成 _EN 列")
+    parser.add_argument('--omit-skipped-columns', action='store_true', help="不需要翻译的列不输出 _EN 副本")
+    parser.add_argument('--profile-sample', type=int, default=1000, metavar='N',
+                        help="列画像时每列抽样的值数量（默认 1000，流式模式在每个工作表的第一块数据中抽样）")
+    parser.add_argument('--no-profile', action='store_true',
+                        help="关闭列画像，所有列（--columns / --exclude-columns 筛选后）都逐值处理")
+    parser.add_argument('--json', action='store_true',
+                        help="以 JSON Lines 格式向标准输出打印进度事件和汇总，日志输出到标准错误")
+    parser.add_argument('--summary', help="把 JSON 汇总写入指定文件")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="把所有文件合计的运行指标写入文件（.prom 为 Prometheus 文本格式，其他为 JSON）")
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help="输出日志到标准错误（-v 显示处理过程，-vv 显示每个请求的详细信息）")
+    return parser
+
+class TranslationService:
+    """集中式翻译服务：多进程模式下运行在管理进程中
+
+    所有工作进程的翻译请求都经过这里，共享同一个限速器、客户端池和翻译记忆库，
+    保证全局速率限制不会因为进程数增加而被突破
+    """
+
+    def __init__(self, max_workers=4, requests_per_second=5.0, memory_path=None, backends=('google',), glossary=None,
+                 adaptive=True, glossary_mode='substitute'):
+        self.translator = ExcelTranslator(memory_path=memory_path)
+        self.translator.set_concurrency(max_workers, requests_per_second, adaptive)
+        self.translator.set_backends(backends, glossary, glossary_mode)
+
+    def translate_pack(self, texts, source_lang, target_lang):
+        """翻译一组文本（先查翻译记忆库），返回与 texts 等长的列表，失败的条目为 None"""
+        memory = self.translator.memory
+        found = memory.get_many(source_lang, target_lang, texts) if memory else {}
+        self.translator.metrics.incr('cache_hits', len(found))
+        missing = [text for text in texts if text not in found]
+        if missing:
+            translated = {text: translation
+                          for text, translation in zip(missing, self.translator._translate_pack(missing, source_lang, target_lang))
+                          if translation is not None}
+            if memory and translated:
+                memory.put_many(source_lang, target_lang, translated)
+            found.update(translated)
+        return [found.get(text) for text in texts]
+
+    def stats(self):
+        """返回翻译记忆库统计"""
+        memory = self.translator.memory
+        return memory.stats() if memory else None
+
+    def metrics(self):
+        """返回网络请求指标快照（含延迟样本，供主进程合并）"""
+        return self.translator.metrics.snapshot(include_samples=True)
+
+class _ServiceManager(BaseManager):
+    """托管 TranslationService 的管理进程"""
+
+_ServiceManager.register('TranslationService', TranslationService)
+
+def _build_translator(options, clients=None):
+    """按命令行选项创建翻译器，clients 为多个文件共享的客户端池"""
+    translator = ExcelTranslator()
+    if clients is not None:
+        translator.clients = clients
+    translator.set_backends(options['backends'], options['glossary'], options['glossary_mode'])
+    translator.set_translation_mode(options['mode'])
+    translator.set_concurrency(max_workers=options['workers'])
+    translator.streaming = options['streaming']
+    translator.categorical = options['categorical']
+    translator.set_output(options['output_engine'], options['sidecars'])
+    translator.resume = options['resume']
+    translator.incremental = options['incremental']
+    translator.previous_path = options['previous']
+    translator.process_workers = options['sheet_processes']
+    translator.skip_filter = SkipFilter(options['skip_patterns'], options['keep_rules'])
+    translator.skip_filter.enabled = options['skip_filter']
+    translator.profiler = ColumnProfiler(options['profile_sample'], options['columns'], options['exclude_columns'])
+    translator.profiler.enabled = options['profile']
+    translator.header_only = options['header_only']
+    translator.omit_skipped_columns = options['omit_skipped_columns']
+    return translator
+
+def _run_translation_job(translator, input_file, output_file, progress=None):
+    """运行单个文件的翻译任务，返回结果汇总"""
+    start = time.time()
+    try:
+        success = translator.process_excel(input_file, output_file, progress)
+        error = None
+    except Exception as e:
+        success = False
+        error = str(e)
+    return {
+        'file': input_file,
+        'output': output_file,
+        'success': success,
+        'seconds': round(time.time() - start, 3),
+        'failed_values': translator.failed_count,
+        'dedup': translator.dedup_report,
+        'skipped': translator.skip_report,
+        'glossary': translator.glossary.stats() if translator.glossary is not None else None,
+        'columns': translator.column_report,
+        'metrics': translator.metrics.snapshot(),
+        'error': error
+    }
+
+def _process_file_worker(input_file, output_file, options, service):
+    """进程池任务：在子进程中完成整个文件的解析、组装和写出，翻译请求交给集中式翻译服务"""
+    configure_logging(options['verbose'])
+    translator = _build_translator(options)
+    translator.remote = service
+    return _run_translation_job(translator, input_file, output_file)
+
+def run_cli(argv=None):
+    """命令行入口：处理单个文件或整个目录，不导入任何GUI组件，返回退出码"""
+    args = build_arg_parser().parse_args(argv)
+    try:
+        input_files = collect_excel_files(args.inputs)
+    except FileNotFoundError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+
+    if args.previous and len(input_files) != 1:
+        print("--previous 只能用于单个输入文件，多个文件请使用 --incremental", file=sys.stderr)
+        return 2
+
+    # 日志输出到标准错误，JSON 模式下标准输出只保留 JSON
+    configure_logging(args.verbose)
+    output_lock = threading.Lock()
+
+    def emit(record):
+        if args.json:
+            with output_lock:
+                sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+                sys.stdout.flush()
+
+    use_processes = args.processes > 1 and len(input_files) > 1
+    options = {
+        'mode': args.mode,
+        'workers': args.workers,
+        'streaming': args.streaming,
+        'categorical': args.categorical,
+        'output_engine': args.output_engine,
+        'sidecars': args.sidecar,
+        'resume': not args.no_resume,
+        'incremental': args.incremental or bool(args.previous),
+        'previous': args.previous,
+        # 文件级多进程时不再在子进程中嵌套进程池
+        'sheet_processes': 1 if use_processes else args.processes,
+        'skip_patterns': args.skip_pattern,
+        'keep_rules': args.keep_rule,
+        'skip_filter': not args.no_skip_filter,
+        'columns': args.columns,
+        'exclude_columns': args.exclude_columns,
+        'header_only': args.header_only,
+        'omit_skipped_columns': args.omit_skipped_columns,
+        'profile': not args.no_profile,
+        'profile_sample': args.profile_sample,
+        'backends': args.backend or ['google'],
+        'glossary': args.glossary,
+        'glossary_mode': args.glossary_mode,
+        'verbose': args.verbose
+    }
+    try:
+        # 提前检查后端配置（术语表文件、可选依赖），避免每个文件各自报错
+        _build_translator(options)
+    except (ValueError, ImportError, OSError) as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    memory_path = None if args.no_memory else args.memory
+    input_root = args.inputs[0] if len(args.inputs) == 1 and os.path.isdir(args.inputs[0]) else None
+    outputs = [translated_output_path(input_file, args.output_dir, input_root) for input_file in input_files]
+
+    def process_file(input_file, output_file):
+        # 所有文件共享翻译记忆库、限速器和客户端池，保证全局速率限制
+        translator = _build_translator(options, clients)
+        translator.memory = memory
+        translator.rate_limiter = rate_limiter
+
+        last_percent = [-1]
+
+        def progress(value, status):
+            percent = int(value)
+            if args.json:
+                emit({'event': 'progress', 'file': input_file, 'progress': round(value, 1), 'status': status})
+            elif percent != last_percent[0]:
+                last_percent[0] = percent
+                with output_lock:
+                    print(f"[进度] {os.path.basename(input_file)} {percent}% {status.splitlines()[0]}",
+                          file=sys.stderr)
+
+        emit({'event': 'start', 'file': input_file, 'output': output_file})
+        result = _run_translation_job(translator, input_file, output_file, progress)
+        metrics.merge(translator.metrics.snapshot(include_samples=True))
+        emit(dict(result, event='done'))
+        return result
+
+    start = time.time()
+    memory = None
+    memory_stats = None
+    metrics = TranslationMetrics()  # 所有文件合计的运行指标
+    if use_processes:
+        # 文件在进程池中并行处理，网络请求集中到管理进程中的翻译服务
+        with _ServiceManager() as manager:
+            service = manager.TranslationService(args.workers * args.processes, args.rate, memory_path,
+                                                 options['backends'], options['glossary'], not args.fixed_rate,
+                                                 options['glossary_mode'])
+            with ProcessPoolExecutor(max_workers=args.processes) as pool:
+                futures = []
+                for input_file, output_file in zip(input_files, outputs):
+                    emit({'event': 'start', 'file': input_file, 'output': output_file})
+                    futures.append(pool.submit(_process_file_worker, input_file, output_file, options, service))
+                results = []
+                for future in futures:
+                    results.append(future.result())
+                    metrics.merge(results[-1]['metrics'])
+                    emit(dict(results[-1], event='done'))
+            memory_stats = service.stats()
+            metrics.merge(service.metrics())
+    else:
+        memory = TranslationMemory(memory_path) if memory_path else None
+        rate_limiter = RateLimiter(args.rate, adaptive=not args.fixed_rate)
+        clients = TranslatorClientPool()
+        if args.jobs > 1 and len(input_files) > 1:
+            with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+                results = list(pool.map(process_file, input_files, outputs))
+        else:
+            results = [process_file(input_file, output_file)
+                       for input_file, output_file in zip(input_files, outputs)]
+        memory_stats = memory.stats() if memory else None
+
+    summary = {
+        'files': len(results),
+        'succeeded': sum(1 for result in results if result['success']),
+        'failed': sum(1 for result in results if not result['success']),
+        'seconds': round(time.time() - start, 3),
+        'memory': memory_stats,
+        'metrics': metrics.snapshot(),
+        'results': results
+    }
+    if args.json:
+        emit(dict(summary, event='summary'))
+    else:
+        for result in results:
+            state = "成功" if result['success'] else "失败"
+            print(f"{state}: {result['file']} -> {result['output']} ({result['seconds']}s)")
+        print(f"共 {summary['files']} 个文件，成功 {summary['succeeded']} 个，失败 {summary['failed']} 个，"
+              f"耗时 {summary['seconds']}s")
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    if args.metrics:
+        metrics.dump(args.metrics)
+    if memory:
+        memory.close()
+    return 0 if summary['failed'] == 0 else 1
+
+def main(argv=None):
+    """主函数：带参数时以命令行模式运行，否则启动图形界面"""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        sys.exit(run_cli(argv))
     app = TranslatorGUI()
     app.run()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # 打包为 exe 后进程池需要
     main() 
\ No newline at end of file
@@ -7,11 +7,23 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('app.ico', '.')],  # 包含图标文件
+    # 这些依赖在运行时延迟导入（见 excel_translator.py 中的 _LazyModule），静态分析找不到，需要显式列出
     hiddenimports=[
         'deep_translator',
+        'deep_translator.exceptions',
+        'deep_translator.validate',
         'pandas',
+        'numpy',
         'openpyxl',
+        'openpyxl.cell',
+        'openpyxl.styles',
+        'requests',
+        'bs4',
         'tkinter',
+        'tkinter.ttk',
+        'tkinter.filedialog',
+        'tkinter.messagebox',
+        'tkinter.font',
         'langdetect'  # 添加新的依赖
     ],
     hookspath=[],